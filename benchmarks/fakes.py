@@ -0,0 +1,243 @@
+# agent_name/benchmarks/fakes.py
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+VENDORS = ["Acme Corp", "Globex Ltd", "Initech", "Umbrella Supplies", "Stark Industries", "Wayne Logistics",
+           "Hooli Cloud", "Soylent Foods", "Cyberdyne Systems", "Tyrell Office"]
+
+# Document text templates. The "clear" ones are easy for the local classifier;
+# the "hard" ones carry no type keywords and have to go to Gemini.
+CLEAR_TEMPLATES = {
+    "Invoice": "# {vendor}\nINVOICE #INV-{number}\nInvoice Date: {date}\nBill To: Example Co\n\n"
+               "| Item | Amount |\n|---|---|\n| Services | {amount} |\n\nSubtotal {amount}\nTotal Amount Due: ${amount}\n",
+    "Receipt": "# {vendor}\nRECEIPT #RC-{number}\nDate: {date}\nCashier: 4\n\nItems {amount}\n"
+               "Amount Paid: ${amount}\nPaid with VISA\nThank you for your purchase!\n",
+    "Purchase Order": "# {vendor}\nPURCHASE ORDER\nPO Number: PO-{number}\nOrder Date: {date}\nShip To: Warehouse 2\n"
+                      "Requested By: Procurement\n\nTotal {amount}\n",
+}
+# Stand-in PDF framing, so downloaded files pass the agent's header sniffing.
+PDF_HEADER, PDF_TRAILER = "%PDF-1.4\n", "\n%%EOF\n"
+# Attachments that aren't documents: (filename, mime type, size in bytes).
+JUNK_ATTACHMENTS = [
+    ("image001.png", "image/png", 4210),
+    ("invite.ics", "text/calendar", 1876),
+    ("smime.p7s", "application/pkcs7-signature", 5120),
+    ("banner.png", "image/png", 9300),
+]
+HARD_TEMPLATE = "{vendor}\nStatement of services rendered, reference {number}\nIssued {date}\n\n" \
+                "Consulting hours ........ {amount}\nPlease remit {amount} within 30 days.\n"
+
+
+def build_corpus(emails: int, attachments_per_email: int = 2, duplicate_ratio: float = 0.2,
+                 hard_ratio: float = 0.3, pages: int = 1, junk_ratio: float = 0.0, seed: int = 7) -> list[dict]:
+    """
+    Builds `emails` simulated GMAIL_NEW_GMAIL_MESSAGE trigger events. Each
+    attachment's content is the markdown the stub extractor will "extract".
+    A share of attachments repeat an earlier document byte for byte, the way
+    vendors resend reminders and forwards, and `junk_ratio` of them are
+    signature logos, calendar invites and the like.
+    """
+    rng = random.Random(seed)
+    documents: list[str] = []
+    events = []
+    for _ in range(emails):
+        # Each email comes from one vendor, as recurring bills do.
+        vendor = rng.choice(VENDORS)
+        attachments = []
+        for _ in range(rng.randint(1, max(1, attachments_per_email * 2 - 1))):
+            attachment_id = uuid.UUID(int=rng.getrandbits(128)).hex
+            if rng.random() < junk_ratio:
+                filename, mime_type, size = rng.choice(JUNK_ATTACHMENTS)
+                attachments.append({"attachmentId": attachment_id, "filename": filename, "mimeType": mime_type,
+                                    "size": size, "content": "x" * size})
+                continue
+            if documents and rng.random() < duplicate_ratio:
+                content = rng.choice(documents)
+            else:
+                doc_type = rng.choice(list(CLEAR_TEMPLATES))
+                template = HARD_TEMPLATE if rng.random() < hard_ratio else CLEAR_TEMPLATES[doc_type]
+                page = template.format(
+                    vendor=vendor,
+                    number=rng.randint(1000, 99999),
+                    date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    amount=f"{rng.uniform(10, 5000):.2f}",
+                )
+                content = PDF_HEADER + "\n\n---\n\n".join([page] * pages) + PDF_TRAILER
+                documents.append(content)
+            attachments.append({"attachmentId": attachment_id, "filename": f"{attachment_id[:8]}.pdf",
+                                "mimeType": "application/pdf", "size": len(content), "content": content})
+        events.append({"payload": {"message_id": uuid.UUID(int=rng.getrandbits(128)).hex,
+                                   "sender": f"{vendor} <billing@{vendor.lower().replace(' ', '-')}.example>",
+                                   "attachment_list": attachments}})
+    return events
+
+
+def _fake_extraction(text: str) -> dict:
+    """What the fake Gemini 'extracts' from a document."""
+    lowered = text.lower()
+    if "invoice" in lowered:
+        doc_type = "Invoice"
+    elif "receipt" in lowered:
+        doc_type = "Receipt"
+    elif "purchase order" in lowered:
+        doc_type = "Purchase Order"
+    else:
+        doc_type = "Invoice" if "remit" in lowered else "Other"
+    number = re.search(r"(?:#|Number: |reference )([A-Z]*-?\d+)", text)
+    date = re.search(r"\d{4}-\d{2}-\d{2}", text)
+    amount = re.findall(r"(\d+\.\d{2})", text)
+    return {
+        "document_type": doc_type,
+        "vendor_name": text.strip().splitlines()[0].lstrip("# ").strip(),
+        "document_id": number.group(1) if number else "N/A",
+        "document_date": date.group(0) if date else "N/A",
+        "total_amount": float(amount[-1]) if amount else "N/A",
+    }
+
+
+class FakeTools:
+    """Simulates the Composio tools the agent calls, with configurable latency and errors."""
+    def __init__(self, attachments: dict[tuple[str, str], str], download_dir: str,
+                 latencies: dict[str, float], error_rate: float = 0.0, seed: int = 11,
+                 mailboxes: dict[str, list[dict]] | None = None):
+        self.attachments = attachments
+        # Trigger events already in each user's mailbox, listed newest first by GMAIL_FETCH_EMAILS.
+        self.mailboxes = mailboxes or {}
+        self.download_dir = download_dir
+        self.latencies = latencies
+        self.error_rate = error_rate
+        self.uploads: list[dict] = []
+        self.calls: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self, slug: str) -> bool:
+        """Sleeps for the tool's latency; returns False if the call should be throttled."""
+        with self._lock:
+            self.calls[slug] = self.calls.get(slug, 0) + 1
+            jitter = self._rng.uniform(0.5, 1.5)
+            throttled = self._rng.random() < self.error_rate
+        time.sleep(self.latencies.get(slug, 0.05) * jitter)
+        return not throttled
+
+    def execute(self, slug: str, user_id: str, arguments: dict) -> dict:
+        if not self._simulate(slug):
+            return {"successful": False, "error": "429 RESOURCE_EXHAUSTED: quota exceeded", "data": {}}
+
+        if slug == "GMAIL_GET_ATTACHMENT":
+            content = self.attachments.get((arguments["message_id"], arguments["attachment_id"]))
+            if content is None:
+                return {"successful": False, "error": "Attachment not found", "data": {}}
+            path = os.path.join(self.download_dir, f"{uuid.uuid4().hex[:8]}_{arguments['file_name']}")
+            with open(path, "w") as f:
+                f.write(content)
+            return {"successful": True, "data": {"file": path}}
+
+        if slug == "GEMINI_GENERATE_CONTENT":
+            prompt = arguments["prompt"]
+            documents = re.findall(r"--- DOCUMENT (\d+) ---\n(.*?)\n--- END OF DOCUMENT \1 ---", prompt, re.S)
+            if documents:
+                result = [dict(_fake_extraction(text), doc_index=int(index)) for index, text in documents]
+            else:
+                text = prompt.split("--- DOCUMENT TEXT ---", 1)[-1].split("--- END OF TEXT ---", 1)[0]
+                result = _fake_extraction(text)
+            return {"successful": True, "data": {"text": "```json\n" + json.dumps(result) + "\n```"}}
+
+        if slug == "GOOGLEDRIVE_UPLOAD_FILE":
+            path = arguments["file_to_upload"]
+            with open(path, "rb") as f:
+                md5 = hashlib.md5(f.read()).hexdigest()
+            upload = {"id": uuid.uuid4().hex, "name": os.path.basename(path), "folder": arguments["folder_to_upload_to"],
+                      "size": os.path.getsize(path), "md5Checksum": md5,
+                      "modifiedTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())}
+            with self._lock:
+                self.uploads.append(upload)
+            return {"successful": True, "data": {"name": upload["name"], "id": upload["id"]}}
+
+        if slug == "GOOGLEDRIVE_FIND_FILE":
+            folder_id = re.search(r"'([^']+)' in parents", arguments["q"]).group(1)
+            since = re.search(r"modifiedTime >= '([^']+)'", arguments["q"])
+            with self._lock:
+                files = [dict(upload, size=str(upload["size"])) for upload in self.uploads
+                         if upload["folder"] == folder_id and (not since or upload["modifiedTime"] >= since.group(1))]
+            return {"successful": True, "data": {"files": files}}
+
+        if slug == "GMAIL_FETCH_EMAILS":
+            mailbox = self.mailboxes.get(user_id, [])
+            start = int(arguments.get("page_token") or 0)
+            end = start + arguments.get("max_results", 100)
+            messages = []
+            for event in mailbox[start:end]:
+                message = {"messageId": event["payload"]["message_id"], "sender": event["payload"]["sender"]}
+                # Like Gmail, the attachment list only comes with the payload.
+                if arguments.get("include_payload", True):
+                    message["attachmentList"] = [
+                        {key: value for key, value in attachment.items() if key != "content"}
+                        for attachment in event["payload"]["attachment_list"]
+                    ]
+                messages.append(message)
+            return {"successful": True,
+                    "data": {"messages": messages, "nextPageToken": str(end) if end < len(mailbox) else None}}
+
+        if slug == "GMAIL_FETCH_MESSAGE_BY_MESSAGE_ID":
+            for event in (event for mailbox in self.mailboxes.values() for event in mailbox):
+                if event["payload"]["message_id"] == arguments["message_id"]:
+                    return {"successful": True, "data": {"messageId": arguments["message_id"], "attachmentList": [
+                        {key: value for key, value in attachment.items() if key != "content"}
+                        for attachment in event["payload"]["attachment_list"]
+                    ]}}
+            return {"successful": False, "error": "Message not found", "data": {}}
+
+        if slug in ("GOOGLEDRIVE_FIND_FOLDER", "GOOGLEDRIVE_CREATE_FOLDER"):
+            name = arguments.get("name_exact") or arguments.get("folder_name")
+            return {"successful": True, "data": {"id": f"folder-{name}", "files": [{"id": f"folder-{name}"}]}}
+
+        return {"successful": True, "data": {}}
+
+
+class FakeSubscription:
+    def __init__(self):
+        self.handlers = {}
+
+    def handle(self, trigger_id: str):
+        def register(callback):
+            self.handlers[trigger_id] = callback
+            return callback
+        return register
+
+
+class FakeComposio:
+    """A local stand-in for COMPOSIO_CLIENT covering the calls the agent makes."""
+    def __init__(self, tools: FakeTools, auth_config_ids: list[str]):
+        self.tools = tools
+        accounts = [SimpleNamespace(id=f"ca-{index}", auth_config_id=auth_config_id, status="active")
+                    for index, auth_config_id in enumerate(auth_config_ids)]
+        self.connected_accounts = SimpleNamespace(list=lambda user_id: accounts)
+        self.subscription = FakeSubscription()
+        self.triggers = SimpleNamespace(
+            list_active=lambda **kwargs: SimpleNamespace(items=[SimpleNamespace(id="trigger-bench")]),
+            create=lambda **kwargs: SimpleNamespace(trigger_id="trigger-bench"),
+            subscribe=lambda: self.subscription,
+        )
+
+
+class StubExtractor:
+    """A DocumentExtractor stand-in: "extracts" a file by reading it, after a simulated OCR delay."""
+    def __init__(self, latency: float = 0.5, seconds_per_page: float = 0.0):
+        self.latency = latency
+        self.seconds_per_page = seconds_per_page
+
+    def extract(self, file_path: str):
+        with open(file_path) as f:
+            text = f.read().removeprefix(PDF_HEADER).removesuffix(PDF_TRAILER)
+        pages = text.count("\n---\n") + 1
+        time.sleep(self.latency * random.uniform(0.5, 1.5) + self.seconds_per_page * pages)
+        return SimpleNamespace(extract_markdown=lambda: text)
@@ -0,0 +1,234 @@
+# agent_name/benchmarks/run.py
+"""
+Offline throughput benchmark for DocumentSorterAgent.
+
+Replays a synthetic corpus of trigger events through the real agent and
+pipeline, with Composio and DocStrange replaced by local stand-ins that
+simulate latency and errors. No network access or accounts are needed.
+
+    python -m benchmarks.run --emails 200
+"""
+import json
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+app = typer.Typer()
+console = Console()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def _configure_environment(state_dir: str, trace_path: str, cache: bool, local_classifier: bool, batch: bool,
+                           ocr_workers: int, templates: bool, drive_index: bool):
+    """Points the agent's settings at throwaway local state before it is imported."""
+    os.environ.update({
+        "COMPOSIO_API_KEY": os.environ.get("COMPOSIO_API_KEY", "bench-key"),
+        "GMAIL_AUTH_CONFIG_ID": "bench-gmail",
+        "GOOGLE_DRIVE_AUTH_CONFIG_ID": "bench-drive",
+        "STATE_DIR": state_dir,
+        "TRACE_PATH": trace_path,
+        "METRICS_PORT": "0",
+        "CACHE_ENABLED": str(cache).lower(),
+        "LOCAL_CLASSIFIER_ENABLED": str(local_classifier).lower(),
+        "DRIVE_INDEX_ENABLED": str(drive_index).lower(),
+        "TEMPLATES_ENABLED": str(templates).lower(),
+        "GEMINI_BATCH_ENABLED": str(batch).lower(),
+        "JOB_RETRY_BASE_SECONDS": "0.1",
+        "OCR_WORKERS": str(ocr_workers),
+        "TOOL_RATE_LIMITS": "",
+        "TOOL_DEFAULT_RATE_LIMIT": "1000/1000",
+    })
+
+
+@app.command()
+def run(
+    emails: int = typer.Option(100, help="Number of simulated emails to replay."),
+    attachments_per_email: int = typer.Option(2, help="Average attachments per email."),
+    duplicate_ratio: float = typer.Option(0.2, help="Share of attachments that resend an earlier document."),
+    hard_ratio: float = typer.Option(0.3, help="Share of documents the local classifier can't handle."),
+    pages: int = typer.Option(1, help="Pages per simulated document."),
+    junk_ratio: float = typer.Option(0.2, help="Share of attachments that are logos, invites and signatures."),
+    download_latency: float = typer.Option(0.15, help="Mean GMAIL_GET_ATTACHMENT latency in seconds."),
+    gemini_latency: float = typer.Option(0.8, help="Mean GEMINI_GENERATE_CONTENT latency in seconds."),
+    upload_latency: float = typer.Option(0.3, help="Mean GOOGLEDRIVE_UPLOAD_FILE latency in seconds."),
+    ocr_latency: float = typer.Option(0.5, help="Mean DocStrange extraction latency in seconds."),
+    ocr_workers: int = typer.Option(4, help="OCR worker processes (0 = single in-process extractor)."),
+    error_rate: float = typer.Option(0.0, help="Probability that any tool call is rate limited."),
+    tenants: int = typer.Option(1, help="Number of mailboxes; the first one receives --noisy-share of the mail."),
+    noisy_share: float = typer.Option(0.7, help="Share of emails sent to the first tenant when --tenants > 1."),
+    tenant_max_concurrency: int = typer.Option(0, help="Per-tenant cap on attachments in flight (0 = no cap)."),
+    cache: bool = typer.Option(True, help="Enable the result cache."),
+    local_classifier: bool = typer.Option(True, help="Enable the local classifier."),
+    templates: bool = typer.Option(True, help="Enable vendor template learning."),
+    drive_index: bool = typer.Option(True, help="Enable the Drive mirror index (skips identical uploads)."),
+    batch: bool = typer.Option(True, help="Enable Gemini micro-batching."),
+    backfill: bool = typer.Option(False, help="Page through the mailboxes with the backfill instead of replaying events."),
+    timeout: float = typer.Option(600, help="Give up waiting for the corpus to drain after this many seconds."),
+    json_output: str = typer.Option(None, help="Also write the results as JSON to this file."),
+):
+    """Replays a simulated inbox through the agent and reports throughput, latency and memory."""
+    work_dir = tempfile.mkdtemp(prefix="docsorter-bench-")
+    trace_path = os.path.join(work_dir, "trace.jsonl")
+    download_dir = os.path.join(work_dir, "downloads")
+    os.makedirs(download_dir)
+    _configure_environment(os.path.join(work_dir, "state"), trace_path, cache, local_classifier, batch,
+                           ocr_workers, templates, drive_index)
+
+    from core.agent import DocumentSorterAgent
+    from core.backfill import Backfiller
+    from core.tenants import DEFAULT_TENANT_ID, Tenant
+    from .fakes import FakeComposio, FakeTools, StubExtractor, build_corpus
+
+    corpus = build_corpus(emails, attachments_per_email, duplicate_ratio, hard_ratio, pages, junk_ratio)
+    contents = {
+        (event["payload"]["message_id"], attachment["attachmentId"]): attachment["content"]
+        for event in corpus for attachment in event["payload"]["attachment_list"]
+    }
+    tenant_ids = [DEFAULT_TENANT_ID] if tenants <= 1 else [f"tenant-{index}" for index in range(tenants)]
+    event_tenants = [
+        tenant_ids[0] if tenants <= 1 or index < noisy_share * len(corpus)
+        else tenant_ids[1 + index % (tenants - 1)]
+        for index in range(len(corpus))
+    ]
+    mailboxes = {
+        f"user-{tenant_id}": [event for event, owner in zip(corpus, event_tenants) if owner == tenant_id]
+        for tenant_id in tenant_ids
+    }
+    tools = FakeTools(contents, download_dir, {
+        "GMAIL_GET_ATTACHMENT": download_latency,
+        "GEMINI_GENERATE_CONTENT": gemini_latency,
+        "GOOGLEDRIVE_UPLOAD_FILE": upload_latency,
+    }, error_rate=error_rate, mailboxes=mailboxes)
+    composio = FakeComposio(tools, ["bench-gmail", "bench-drive"])
+
+    tracemalloc.start()
+    try:
+        agent = DocumentSorterAgent(
+            composio=composio, extractor_factory=partial(StubExtractor, ocr_latency),
+            tenants=[Tenant(tenant_id, f"user-{tenant_id}", "bench-gmail", "bench-drive",
+                            max_concurrency=tenant_max_concurrency) for tenant_id in tenant_ids],
+        )
+        agent.start_processing()
+        attachment_filter = agent.attachment_filter
+        queued = sum(
+            1 for event in corpus for attachment in event["payload"]["attachment_list"]
+            if attachment_filter is None or attachment_filter.reject_reason(attachment) is None
+        )
+        console.print(f"[bold]Replaying {emails} emails with {len(contents)} attachments...[/bold]")
+
+        started, started_at = time.perf_counter(), time.time()
+        # One feeder per tenant, as the runtime has per-tenant event consumers.
+        for tenant_id in tenant_ids:
+            if backfill:
+                backfiller = Backfiller(agent, os.path.join(work_dir, "state"), "has:attachment", page_size=25,
+                                        tenant=agent.tenants[tenant_id])
+                feed = backfiller.run
+            else:
+                feed = lambda events=mailboxes[f"user-{tenant_id}"], tenant_id=tenant_id: [
+                    agent.handle_email_event(event, tenant_id=tenant_id) for event in events
+                ]
+            threading.Thread(target=feed, daemon=True).start()
+        while time.perf_counter() - started < timeout:
+            counts = agent.jobs.counts()
+            if counts.get("done", 0) + counts.get("failed", 0) >= queued:
+                break
+            agent.resume_due_jobs()
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        agent.stop_processing()
+        _, peak_traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    counts = agent.jobs.counts()
+    stage_latencies: dict[str, list[float]] = {}
+    sources: dict[str, int] = {}
+    finish_times: dict[str, list[float]] = {}
+    with open(trace_path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record["stages"]:
+                finish_times.setdefault(record["tenant_id"], []).append(
+                    max(span["at"] for span in record["stages"]) - started_at
+                )
+            sources[record["classified_by"] or "none"] = sources.get(record["classified_by"] or "none", 0) + 1
+            for span in record["stages"]:
+                stage_latencies.setdefault(span["stage"], []).append(span["seconds"])
+
+    results = {
+        "attachments": len(contents),
+        "filtered": len(contents) - queued,
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_second": round(counts.get("done", 0) / elapsed, 3) if elapsed else 0.0,
+        "stages": {
+            stage: {f"p{pct}": round(percentile(values, pct), 4) for pct in (50, 95, 99)}
+            for stage, values in stage_latencies.items()
+        },
+        "classified_by": sources,
+        "uploaded": len(tools.uploads),
+        "duplicate_names_in_drive": len(tools.uploads) - len({(u["folder"], u["name"]) for u in tools.uploads}),
+        "tenants": {
+            tenant_id: {
+                "attachments": len(values),
+                "p50_finish_seconds": round(percentile(values, 50), 3),
+                "p95_finish_seconds": round(percentile(values, 95), 3),
+            }
+            for tenant_id, values in sorted(finish_times.items())
+        },
+        "tool_calls": tools.calls,
+        "peak_traced_memory_mb": round(peak_traced / 2**20, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+    }
+
+    table = Table(title="Per-stage latency (seconds)")
+    table.add_column("Stage")
+    for pct in (50, 95, 99):
+        table.add_column(f"p{pct}", justify="right")
+    for stage, values in results["stages"].items():
+        table.add_row(stage, *(f"{value:.3f}" for value in values.values()))
+    console.print(table)
+    console.print(f"Processed [bold]{results['done']}[/bold]/{results['attachments']} attachments "
+                  f"({results['failed']} failed, {results['filtered']} filtered before download) in {results['elapsed_seconds']}s: "
+                  f"[bold green]{results['docs_per_second']} docs/sec[/bold green]")
+    console.print(f"Classified by: {results['classified_by']}")
+    console.print(f"Uploaded {results['uploaded']} file(s); identical files already in Drive were skipped "
+                  f"({results['duplicate_names_in_drive']} name collisions in Drive)")
+    if tenants > 1:
+        tenant_table = Table(title="Per-tenant completion (seconds since start)")
+        for column in ("Tenant", "Attachments", "p50", "p95"):
+            tenant_table.add_column(column, justify="left" if column == "Tenant" else "right")
+        for tenant_id, stats in results["tenants"].items():
+            tenant_table.add_row(tenant_id, str(stats["attachments"]), f"{stats['p50_finish_seconds']:.3f}",
+                                 f"{stats['p95_finish_seconds']:.3f}")
+        console.print(tenant_table)
+    console.print(f"Tool calls: {results['tool_calls']}")
+    console.print(f"Peak traced memory: {results['peak_traced_memory_mb']} MiB, "
+                  f"max RSS: {results['max_rss_mb']} MiB")
+
+    if json_output:
+        with open(json_output, "w") as f:
+            json.dump(results, f, indent=2)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    app()
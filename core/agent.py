@@ -1,17 +1,94 @@
-import time
 import os
+import threading
+import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable
 from datetime import date
 from rich.console import Console
-from docstrange import DocumentExtractor
 
 from .constants import (
-    COMPOSIO_CLIENT,
+    get_composio_client,
     COMPOSIO_USER_ID,
     GMAIL_AUTH_CONFIG_ID,
-    GOOGLE_DRIVE_AUTH_CONFIG_ID
+    GOOGLE_DRIVE_AUTH_CONFIG_ID,
+    TENANTS_PATH,
+    TENANT_MAX_CONCURRENCY,
+    ATTACHMENT_FILTER_ENABLED,
+    ATTACHMENT_EXTENSIONS,
+    ATTACHMENT_MIN_IMAGE_BYTES,
+    ATTACHMENT_MAX_BYTES,
+    PIPELINE_DOWNLOAD_WORKERS,
+    PIPELINE_EXTRACT_WORKERS,
+    PIPELINE_CLASSIFY_WORKERS,
+    PIPELINE_UPLOAD_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    CACHE_ENABLED,
+    CACHE_PATH,
+    CACHE_MAX_BYTES,
+    CACHE_TTL_SECONDS,
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_PATH,
+    LOCAL_CLASSIFIER_THRESHOLD,
+    TEMPLATES_ENABLED,
+    TEMPLATES_PATH,
+    TEMPLATE_MIN_CONFIRMATIONS,
+    GEMINI_BATCH_ENABLED,
+    GEMINI_BATCH_MAX_SIZE,
+    GEMINI_BATCH_MAX_WAIT_MS,
+    GEMINI_CONTEXT_MAX_CHARS,
+    JOB_QUEUE_PATH,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_SECONDS,
+    STATE_DIR,
+    SPOOL_MEMORY_DIR,
+    SPOOL_DISK_DIR,
+    SPOOL_MAX_MEMORY_BYTES,
+    SPOOL_MAX_MEMORY_TOTAL_BYTES,
+    TOOL_RATE_LIMITS,
+    TOOL_DEFAULT_RATE_LIMIT,
+    TOOL_INITIAL_CONCURRENCY,
+    TOOL_MAX_CONCURRENCY,
+    TOOL_MAX_RETRIES,
+    METRICS_PORT,
+    METRICS_HOST,
+    TRACE_PATH,
+    DRIVE_INDEX_ENABLED,
+    DRIVE_INDEX_PATH,
+    DRIVE_INDEX_SYNC_SECONDS,
+    DRIVE_INDEX_FULL_SYNC_SECONDS,
+    SEARCH_INDEX_ENABLED,
+    SEARCH_INDEX_PATH,
+    STARTUP_CACHE_ENABLED,
+    STARTUP_STATE_PATH,
+    OCR_WORKERS,
+    OCR_PAGES_PER_CHUNK,
+    OCR_SPLIT_MIN_PAGES,
+    SHUTDOWN_TIMEOUT_SECONDS,
+    EVENT_WORKERS
 )
 from .connection import ensure_connection 
+from .backfill import Backfiller, build_gmail_query
+from .batching import GeminiBatcher
+from .cache import ResultCache
+from .classifier import LocalClassifier
+from .filters import AttachmentFilter
+from .context import build_context
+from .drive_index import DriveIndex
+from .job_queue import JobQueue, RetryLater
+from .metrics import BYTES_BUCKETS, CONTEXT_CHARS_BUCKETS, METRICS, TraceLog, start_metrics_server
+from .ocr import OcrEngine, default_extractor_factory
+from .pipeline import AttachmentJob, AttachmentPipeline, Stage
+from .runtime import AgentRuntime
+from .spool import AttachmentSpool, default_memory_dir
+from .rate_limit import ToolExecutor, parse_rate_limit, parse_rate_limits
+from .scheduler import FairScheduler
+from .search_index import SearchIndex
+from .state import StartupState
+from .templates import TemplateStore
+from .tenants import DEFAULT_TENANT_ID, DRIVE_FOLDERS, Tenant, load_tenants
 
 console = Console()
 
@@ -19,33 +96,187 @@ class DocumentSorterAgent:
     """
     An intelligent agent that monitors a Gmail account, processes attachments,
     and files them in Google Drive with standardized names.
+
+    One agent can serve several mailboxes (tenants) loaded from TENANTS_PATH;
+    they share the Composio client, extractors, caches and pipeline, and a
+    fair scheduler keeps one busy mailbox from starving the others. Without
+    a tenants file the agent serves a single default tenant from the .env
+    settings.
+
+    A Composio client, a DocStrange extractor (or a picklable factory that
+    creates one in each OCR worker process) and the tenant list can be
+    injected, e.g. to run the agent against local stand-ins in the benchmark
+    harness.
     """
-    def __init__(self):
-        self.composio = COMPOSIO_CLIENT
+    DRIVE_FOLDERS = list(DRIVE_FOLDERS)
+
+    def __init__(self, composio=None, extractor=None, extractor_factory=None, tenants: list[Tenant] | None = None):
+        self._composio = composio
+        # Gemini calls are shared by all tenants and run as this user.
         self.user_id = COMPOSIO_USER_ID
-        self.folder_ids = {} 
+        if tenants is None:
+            tenants = load_tenants(
+                TENANTS_PATH, GMAIL_AUTH_CONFIG_ID, GOOGLE_DRIVE_AUTH_CONFIG_ID, TENANT_MAX_CONCURRENCY
+            ) if TENANTS_PATH else [Tenant(
+                DEFAULT_TENANT_ID, COMPOSIO_USER_ID, GMAIL_AUTH_CONFIG_ID, GOOGLE_DRIVE_AUTH_CONFIG_ID,
+                max_concurrency=TENANT_MAX_CONCURRENCY,
+            )]
+        self.tenants = {tenant.tenant_id: tenant for tenant in tenants}
+        self.scheduler = FairScheduler(PIPELINE_QUEUE_SIZE)
+        self.subscription = None
+        self.tools = ToolExecutor(
+            lambda: self.composio,
+            rate_limits=parse_rate_limits(TOOL_RATE_LIMITS),
+            default_rate_limit=parse_rate_limit(TOOL_DEFAULT_RATE_LIMIT),
+            initial_concurrency=TOOL_INITIAL_CONCURRENCY,
+            max_concurrency=TOOL_MAX_CONCURRENCY,
+            max_retries=TOOL_MAX_RETRIES,
+        )
+        self.metrics_server = None
+        self.spool = AttachmentSpool(
+            SPOOL_MEMORY_DIR or default_memory_dir(), SPOOL_DISK_DIR, SPOOL_MAX_MEMORY_BYTES,
+            SPOOL_MAX_MEMORY_TOTAL_BYTES,
+        )
+        self.attachment_filter = AttachmentFilter(
+            ATTACHMENT_EXTENSIONS, ATTACHMENT_MIN_IMAGE_BYTES, ATTACHMENT_MAX_BYTES
+        ) if ATTACHMENT_FILTER_ENABLED else None
+        self.trace_log = TraceLog(TRACE_PATH) if TRACE_PATH else None
+        self.cache = ResultCache(CACHE_PATH, CACHE_MAX_BYTES, CACHE_TTL_SECONDS) if CACHE_ENABLED else None
+        self.jobs = JobQueue(JOB_QUEUE_PATH, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS)
+        self.drive_index = DriveIndex(DRIVE_INDEX_PATH) if DRIVE_INDEX_ENABLED else None
+        self.search_index = SearchIndex(SEARCH_INDEX_PATH) if SEARCH_INDEX_ENABLED else None
+        self._drive_sync_stop = threading.Event()
+        self.classifier = LocalClassifier(LOCAL_CLASSIFIER_PATH) if LOCAL_CLASSIFIER_ENABLED else None
+        self.templates = TemplateStore(TEMPLATES_PATH, TEMPLATE_MIN_CONFIRMATIONS) if TEMPLATES_ENABLED else None
+        self.batcher = GeminiBatcher(
+            self._extract_structured_data_batch_with_gemini,
+            self._extract_structured_data_with_gemini,
+            max_batch_size=GEMINI_BATCH_MAX_SIZE,
+            max_wait_ms=GEMINI_BATCH_MAX_WAIT_MS,
+        ) if GEMINI_BATCH_ENABLED else None
         
         console.print("\n[bold]================ Document Sorter Agent Initialising ================[/bold]")
         
+        self.extractor = extractor
+        self.ocr = None
         try:
-            self.extractor = DocumentExtractor()
-            console.print("[green]✓ DocStrange Extractor Initialized.[/green]")
+            if extractor is None and OCR_WORKERS > 0:
+                self.ocr = OcrEngine(
+                    extractor_factory or default_extractor_factory, OCR_WORKERS,
+                    pages_per_chunk=OCR_PAGES_PER_CHUNK, split_min_pages=OCR_SPLIT_MIN_PAGES,
+                )
+                self.ocr.warm_up()
+                console.print(f"[green]✓ DocStrange Extractor Initialized in {self.ocr.workers} worker processes.[/green]")
+            else:
+                if self.extractor is None:
+                    self.extractor = (extractor_factory or default_extractor_factory)()
+                console.print("[green]✓ DocStrange Extractor Initialized.[/green]")
         except Exception as e:
             console.print(f"[bold red]❌ Failed to initialize DocStrange. Please run 'docstrange login'. Error: {e}[/bold red]")
             return
 
-        # Onboard user and set up necessary connections and triggers
-        gmail_connection = ensure_connection(self.composio, self.user_id, GMAIL_AUTH_CONFIG_ID, "Gmail")
-        self.trigger_id = self._get_or_create_trigger(gmail_connection.id)
-        if not self.trigger_id:
-            console.print("[bold red]❌ Critical error: Failed to set up trigger. Agent cannot start.[/bold red]")
+        self.startup_states = {
+            tenant.tenant_id: StartupState(STARTUP_STATE_PATH, tenant.user_id) for tenant in tenants
+        } if STARTUP_CACHE_ENABLED else {}
+        restored = [tenant for tenant in tenants if self._restore_cached_setup(tenant)]
+        if restored:
+            console.print(f"[green]✓ Restored connections, triggers and folders of {len(restored)} tenant(s) "
+                          "from the startup cache.[/green]")
+            threading.Thread(
+                target=self._revalidate_setup, args=(restored,), name="startup-revalidation", daemon=True
+            ).start()
+        if not self._configure():
             return
 
-        ensure_connection(self.composio, self.user_id, GOOGLE_DRIVE_AUTH_CONFIG_ID, "Google Drive")
-        self._setup_drive_folders(['Invoices', 'Receipts', 'Purchase Orders', 'Uncategorized'])
-
         console.print("\n[bold green]✅ All connections verified and folders configured. Agent is ready.[/bold green]")
 
+    @property
+    def composio(self):
+        """The Composio client, built on first use."""
+        if self._composio is None:
+            self._composio = get_composio_client()
+        return self._composio
+
+    def _configure(self) -> bool:
+        """Sets up every tenant that isn't ready yet, dropping those that fail. Returns False if none are left."""
+        for tenant in list(self.tenants.values()):
+            if tenant.trigger_id and self._has_all_folders(tenant):
+                continue
+            if not self._configure_tenant(tenant):
+                console.print(f"[bold red]❌ Could not set up tenant '{tenant.tenant_id}'; it will be skipped.[/bold red]")
+                del self.tenants[tenant.tenant_id]
+        if not self.tenants:
+            console.print("[bold red]❌ Critical error: Failed to set up trigger. Agent cannot start.[/bold red]")
+            return False
+        return True
+
+    def _has_all_folders(self, tenant: Tenant) -> bool:
+        return all(tenant.folder_ids.get(name) for name in self.DRIVE_FOLDERS)
+
+    def _configure_tenant(self, tenant: Tenant) -> bool:
+        """Verifies a tenant's connections, trigger and Drive folders, and caches the resulting IDs."""
+        if len(self.tenants) > 1:
+            console.print(f"\n[bold]Setting up tenant '{tenant.tenant_id}'...[/bold]")
+        # Onboard user and set up necessary connections and triggers
+        try:
+            connections = list(self.composio.connected_accounts.list(user_id=tenant.user_id))
+        except Exception:
+            connections = None # ensure_connection will list (and handle errors) itself
+        gmail_connection = ensure_connection(
+            self.composio, tenant.user_id, tenant.gmail_auth_config_id, "Gmail", connections
+        )
+        trigger_id = self._get_or_create_trigger(gmail_connection.id)
+        if not trigger_id:
+            return False
+        tenant.trigger_id = trigger_id
+
+        drive_connection = ensure_connection(
+            self.composio, tenant.user_id, tenant.drive_auth_config_id, "Google Drive", connections
+        )
+        self._setup_drive_folders(tenant)
+
+        state = self.startup_states.get(tenant.tenant_id)
+        if state and self._has_all_folders(tenant):
+            state.save(
+                {tenant.gmail_auth_config_id: gmail_connection.id, tenant.drive_auth_config_id: drive_connection.id},
+                tenant.trigger_id,
+                dict(tenant.folder_ids),
+            )
+        return True
+
+    def _restore_cached_setup(self, tenant: Tenant) -> bool:
+        """Applies a tenant's cached trigger and folder IDs if they cover everything it needs."""
+        state = self.startup_states.get(tenant.tenant_id)
+        cached = state.load() if state else {}
+        connections = cached.get("connections", {})
+        folder_ids = cached.get("folder_ids", {})
+        if not (cached.get("trigger_id")
+                and tenant.gmail_auth_config_id in connections and tenant.drive_auth_config_id in connections
+                and all(folder_ids.get(name) for name in self.DRIVE_FOLDERS)):
+            return False
+        tenant.trigger_id = cached["trigger_id"]
+        tenant.folder_ids.update(folder_ids)
+        return True
+
+    def _revalidate_setup(self, tenants: list[Tenant]):
+        """Re-runs the full setup of tenants restored from the cache and picks up any IDs that changed."""
+        for tenant in tenants:
+            previous_trigger_id = tenant.trigger_id
+            try:
+                configured = self._configure_tenant(tenant)
+            except Exception as e:
+                console.print(f"[yellow]⚠️ Could not revalidate the cached setup of '{tenant.tenant_id}': {e}[/yellow]")
+                configured = False
+            if not configured:
+                # The cached IDs may be stale; the next start has to set the tenant up from scratch.
+                state = self.startup_states.get(tenant.tenant_id)
+                if state:
+                    state.clear()
+                continue
+            if tenant.trigger_id != previous_trigger_id and self.subscription is not None:
+                console.print(f"[yellow]Trigger changed to {tenant.trigger_id}; re-subscribing.[/yellow]")
+                self._subscribe_tenant(tenant)
+
     def _get_or_create_trigger(self, connected_account_id: str) -> str | None:
         """Checks for an active trigger or creates one if it doesn't exist."""
         console.print("\n[bold]Configuring Gmail Trigger...[/bold]")
@@ -69,43 +300,51 @@ class DocumentSorterAgent:
             console.print(f"[bold red]   - ❌ Error configuring trigger: {e}[/bold red]")
             return None
 
-    def _setup_drive_folders(self, folder_names: list):
-        """Ensures necessary folders exist in Google Drive, creating them if needed."""
+    def _setup_drive_folders(self, tenant: Tenant):
+        """Ensures a tenant's Drive folders exist, creating them if needed."""
         console.print("\n[bold]Configuring Google Drive folders...[/bold]")
-        for name in folder_names:
-            try:
-                find_response = self.composio.tools.execute(
-                    slug="GOOGLEDRIVE_FIND_FOLDER", user_id=self.user_id, arguments={"name_exact": name}
+        with ThreadPoolExecutor(max_workers=len(self.DRIVE_FOLDERS) or 1) as executor:
+            list(executor.map(lambda category: self._setup_drive_folder(tenant, category), self.DRIVE_FOLDERS))
+
+    def _setup_drive_folder(self, tenant: Tenant, category: str):
+        """Finds (or creates) the Drive folder for one category and records its ID."""
+        name = tenant.folders.get(category, category)
+        try:
+            find_response = self.tools.execute(
+                slug="GOOGLEDRIVE_FIND_FOLDER", user_id=tenant.user_id, arguments={"name_exact": name}
+            )
+            if not find_response.get("data", {}).get("files"):
+                console.print(f"   - Folder '[yellow]{name}[/yellow]' not found. Creating it...")
+                create_response = self.tools.execute(
+                    slug="GOOGLEDRIVE_CREATE_FOLDER", user_id=tenant.user_id, arguments={"folder_name": name}
                 )
-                if not find_response.get("data", {}).get("files"):
-                    console.print(f"   - Folder '[yellow]{name}[/yellow]' not found. Creating it...")
-                    create_response = self.composio.tools.execute(
-                        slug="GOOGLEDRIVE_CREATE_FOLDER", user_id=self.user_id, arguments={"folder_name": name}
-                    )
-                    folder_id = create_response.get("data", {}).get("id")
-                    console.print(f"   - [green]✓ Created folder '{name}'[/green]")
-                else:
-                    folder_id = find_response["data"]["files"][0]["id"]
-                    console.print(f"   - [green]✓ Found folder '{name}'[/green]")
-                self.folder_ids[name] = folder_id
-            except Exception as e:
-                console.print(f"[bold red]Error setting up folder {name}: {e}[/bold red]")
+                folder_id = create_response.get("data", {}).get("id")
+                console.print(f"   - [green]✓ Created folder '{name}'[/green]")
+            else:
+                folder_id = find_response["data"]["files"][0]["id"]
+                console.print(f"   - [green]✓ Found folder '{name}'[/green]")
+            tenant.folder_ids[category] = folder_id
+        except Exception as e:
+            console.print(f"[bold red]Error setting up folder {name}: {e}[/bold red]")
     
     def _extract_text_with_docstrange(self, file_path: str) -> str | None:
-        """Uses DocStrange to extract text content from a file."""
+        """
+        Uses DocStrange to extract text content from a file. An OCR worker that
+        died is raised rather than reported as no text, so the job is retried.
+        """
         console.print("   - [blue]   ↳ 🧠 Extracting text with DocStrange...[/blue]")
         try:
+            if self.ocr:
+                return self.ocr.extract(file_path)
             result = self.extractor.extract(file_path)
             return result.extract_markdown()
+        except BrokenProcessPool:
+            raise
         except Exception as e:
             console.print(f"   - [red]❌ DocStrange extraction failed: {e}[/red]")
             return None
 
-    def _extract_structured_data_with_gemini(self, document_text: str) -> dict | None:
-        """Uses Gemini to classify the document and extract structured data."""
-        console.print("   - [blue]   ↳ 🤖 Asking Gemini to classify and extract data...[/blue]")
-        prompt = f"""
-        Analyze the document text and perform two tasks:
+    EXTRACTION_INSTRUCTIONS = """
         1. Classify the document_type as one of: 'Invoice', 'Receipt', 'Purchase Order', or 'Other'.
         2. Extract the following fields. If a field is not present or not applicable, use "N/A".
             - document_type: The type of document.
@@ -113,34 +352,129 @@ class DocumentSorterAgent:
             - document_id: The invoice number, receipt ID, or PO number.
             - document_date: The primary date on the document (invoice date, receipt date, etc.), in YYYY-MM-DD format.
             - total_amount: The final total amount, as a number.
+        """
+
+    def _gemini_context(self, document_text: str) -> str:
+        """Reduces the document text to the budgeted context sent to Gemini."""
+        context = build_context(document_text, GEMINI_CONTEXT_MAX_CHARS)
+        METRICS.observe("docsorter_gemini_context_chars", len(context), buckets=CONTEXT_CHARS_BUCKETS)
+        METRICS.observe("docsorter_document_chars", len(document_text), buckets=CONTEXT_CHARS_BUCKETS)
+        return context
+
+    def _generate_with_gemini(self, prompt: str) -> str:
+        """Sends a prompt to Gemini and returns the response text with any JSON fence removed."""
+        response = self.tools.execute(
+            slug="GEMINI_GENERATE_CONTENT",
+            user_id=self.user_id,
+            arguments={ "model": "gemini-2.0-flash", "prompt": prompt, "temperature": 0.0, }
+        )
+        llm_response_str = response.get("data", {}).get("text", "").strip()
+        if llm_response_str.startswith("```"):
+            llm_response_str = llm_response_str.split("\n", 1)[-1].rsplit("```", 1)[0]
+        return llm_response_str
 
+    def _extract_structured_data_with_gemini(self, document_text: str) -> dict | None:
+        """Uses Gemini to classify the document and extract structured data."""
+        console.print("   - [blue]   ↳ 🤖 Asking Gemini to classify and extract data...[/blue]")
+        prompt = f"""
+        Analyze the document text and perform two tasks:
+        {self.EXTRACTION_INSTRUCTIONS}
         Provide the output as a single, clean JSON object with no additional text or formatting.
 
         --- DOCUMENT TEXT ---
-        {document_text[:8000]} 
+        {self._gemini_context(document_text)}
         --- END OF TEXT ---
         """
         try:
-            response = self.composio.tools.execute(
-                slug="GEMINI_GENERATE_CONTENT",
-                user_id=self.user_id,
-                arguments={ "model": "gemini-2.0-flash", "prompt": prompt, "temperature": 0.0, }
-            )
-            llm_response_str = response.get("data", {}).get("text", "")
-            if llm_response_str.startswith("```json"):
-                llm_response_str = llm_response_str[7:-4]
+            llm_response_str = self._generate_with_gemini(prompt)
             if not llm_response_str: return None
             return json.loads(llm_response_str)
         except Exception as e:
             console.print(f"[red]   - ❌ Gemini data extraction failed: {e}[/red]")
             return None
 
+    def _extract_structured_data_batch_with_gemini(self, document_texts: list[str]) -> list[dict | None] | None:
+        """
+        Uses one Gemini call to classify several documents. Returns one result per
+        document (None where the response has no usable entry), or None if the
+        response can't be parsed at all.
+        """
+        documents = "\n".join(
+            f"--- DOCUMENT {index} ---\n{self._gemini_context(text)}\n--- END OF DOCUMENT {index} ---"
+            for index, text in enumerate(document_texts)
+        )
+        prompt = f"""
+        Analyze each of the {len(document_texts)} documents below and, for each one, perform two tasks:
+        {self.EXTRACTION_INSTRUCTIONS}
+        Provide the output as a single, clean JSON array with no additional text or formatting,
+        containing one object per document with an extra "doc_index" field set to the document's number.
+
+        {documents}
+        """
+        try:
+            items = json.loads(self._generate_with_gemini(prompt))
+        except Exception as e:
+            console.print(f"[yellow]   - ⚠️ Could not parse batched Gemini response: {e}[/yellow]")
+            return None
+        if not isinstance(items, list):
+            return None
+
+        results = [None] * len(document_texts)
+        for item in items:
+            if not isinstance(item, dict): continue
+            try:
+                index = int(item.pop("doc_index"))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(results):
+                results[index] = item
+        return results
+
+    def _extract_with_template(self, document_text: str, sender: str | None) -> dict | None:
+        """Returns the fields extracted by a learned vendor template, if one fits the document."""
+        if not self.templates:
+            return None
+        try:
+            structured_data = self.templates.extract(document_text, sender)
+        except Exception as e:
+            console.print(f"   - [yellow]   ↳ ⚠️ Template extraction failed: {e}[/yellow]")
+            return None
+        if structured_data:
+            console.print(f"   - [blue]   ↳ 📐 Extracted with the template for '{structured_data['vendor_name']}', "
+                          "skipping Gemini.[/blue]")
+        return structured_data
+
+    def _learn_template(self, document_text: str, structured_data: dict, sender: str | None):
+        """Records a Gemini result so later documents of the same layout can skip Gemini."""
+        if not self.templates:
+            return
+        try:
+            outcome = self.templates.learn(document_text, structured_data, sender)
+        except Exception as e:
+            console.print(f"   - [yellow]   ↳ ⚠️ Could not record vendor template: {e}[/yellow]")
+            return
+        METRICS.inc("docsorter_templates_learned_total", outcome=outcome or "rejected")
+
+    def _classify_locally(self, document_text: str) -> dict | None:
+        """Returns the local classifier's result if it is confident enough, else None."""
+        if not self.classifier:
+            return None
+        try:
+            structured_data, confidence = self.classifier.classify(document_text)
+        except Exception as e:
+            console.print(f"   - [yellow]   ↳ ⚠️ Local classification failed: {e}[/yellow]")
+            return None
+        if confidence < LOCAL_CLASSIFIER_THRESHOLD:
+            return None
+        console.print(f"   - [blue]   ↳ ⚡ Classified locally (confidence {confidence:.2f}), skipping Gemini.[/blue]")
+        return structured_data
+
     def _rename_file_from_data(self, structured_data: dict, original_path: str) -> str:
         """Creates a standardized filename from extracted data and renames the local file."""
         try:
             doc_date = structured_data.get("document_date") or date.today().isoformat()
-            vendor = structured_data.get("vendor_name", "UnknownVendor")
-            doc_id = structured_data.get("document_id", "NoID")
+            vendor = str(structured_data.get("vendor_name", "UnknownVendor"))
+            doc_id = str(structured_data.get("document_id", "NoID"))
             
             vendor = "".join(c for c in vendor if c.isalnum() or c in " -_").rstrip()
             doc_id = "".join(c for c in doc_id if c.isalnum() or c in " -_").rstrip()
@@ -150,7 +484,7 @@ class DocumentSorterAgent:
             
             new_filename = f"{doc_date}_{vendor}_{doc_id}{extension}"
             new_path = os.path.join(directory, new_filename)
-            
+
             os.rename(original_path, new_path)
             console.print(f"   - [cyan]   ↳ 📝 Renamed file to:[/cyan] {new_filename}")
             return new_path
@@ -158,78 +492,438 @@ class DocumentSorterAgent:
             console.print(f"   - [red]❌ Error renaming file: {e}[/red]")
             return original_path
 
-    def start_listening(self):
-        """Starts the main listening loop for the agent."""
-        if not hasattr(self, 'trigger_id') or not self.trigger_id: 
-            console.print("[bold red]Agent cannot listen: Trigger ID was not set during initialization.[/bold red]")
-            return
+    def _download_attachment(self, job: AttachmentJob) -> AttachmentJob:
+        """Pipeline stage: downloads the attachment from Gmail to a local file."""
+        console.print(f"\n   - [green]Processing attachment:[/green] {job.filename}")
+        download_result = self.tools.execute(
+            slug="GMAIL_GET_ATTACHMENT", user_id=self.tenants[job.tenant_id].user_id,
+            arguments={"message_id": job.message_id, "attachment_id": job.attachment_id, "file_name": job.filename}
+        )
+        if not download_result.get("successful"):
+            raise RuntimeError("Download failed.")
 
-        console.print(f"👂 Agent is now listening for trigger '[bold yellow]{self.trigger_id}[/bold yellow]'...")
-        console.print("Press [bold red]Ctrl+C[/bold red] to stop the agent.")
-        self.subscription = self.composio.triggers.subscribe()
+        spooled = self.spool.ingest(download_result["data"]["file"], job.filename)
+        job.local_file_path = spooled.path
+        job.final_file_path = spooled.path
+        METRICS.inc("docsorter_spooled_total", location="memory" if spooled.in_memory else "disk")
+        reason = self.attachment_filter.sniff_bytes(
+            spooled.head, spooled.tail, spooled.size, job.filename
+        ) if self.attachment_filter else None
+        if reason:
+            METRICS.inc("docsorter_attachments_filtered_total", reason=reason)
+            console.print(f"   - [grey50]   ↳ ⏭️ ({job.filename}) Not a supported document ({reason}), skipping.[/grey50]")
+            self.spool.release(spooled.path)
+            job.skip_reason = reason
+            return None
+        job.content_hash = spooled.content_hash
+        METRICS.observe("docsorter_attachment_bytes", spooled.size, buckets=BYTES_BUCKETS)
+        console.print(f"   - [bold green]   ↳ ✅ ({job.filename}) Download successful![/bold green]")
+        return job
+
+    def _extract_stage(self, job: AttachmentJob) -> AttachmentJob:
+        """Pipeline stage: extracts the document text with DocStrange, unless cached."""
+        cached = self.cache.get(job.content_hash) if self.cache else None
+        if self.cache:
+            METRICS.inc("docsorter_cache_requests_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            job.document_text, job.structured_data = cached
+            job.cache_hit = True
+            job.classified_by = "cache"
+            console.print(f"   - [grey50]   ↳ ⚡ ({job.filename}) Cache hit, skipping extraction.[/grey50]")
+            return job
 
-        @self.subscription.handle(trigger_id=self.trigger_id)
-        def handle_new_email(data):
-            email_payload = data.get("payload", {})
-            message_id = email_payload.get("message_id")
-            attachment_list = email_payload.get("attachment_list", [])
+        job.document_text = self._extract_text_with_docstrange(job.local_file_path)
+        return job
 
-            if not message_id or not attachment_list: return
+    def _classify_stage(self, job: AttachmentJob) -> AttachmentJob:
+        """Pipeline stage: classifies the document and renames the local file."""
+        if job.document_text:
+            if job.structured_data is None:
+                job.structured_data = self._extract_with_template(job.document_text, job.sender)
+                if job.structured_data:
+                    job.classified_by = "template"
+            if job.structured_data is None:
+                job.structured_data = self._classify_locally(job.document_text)
+                if job.structured_data:
+                    job.classified_by = "local"
+            if job.structured_data is None:
+                if self.batcher:
+                    job.structured_data = self.batcher.classify(job.document_text)
+                else:
+                    job.structured_data = self._extract_structured_data_with_gemini(job.document_text)
+                if job.structured_data:
+                    job.classified_by = "gemini"
+                    if self.classifier:
+                        self.classifier.record(job.document_text, job.structured_data)
+                    self._learn_template(job.document_text, job.structured_data, job.sender)
+            if self.cache and not job.cache_hit and job.structured_data:
+                self.cache.put(job.content_hash, job.document_text, job.structured_data)
+            if job.structured_data:
+                METRICS.inc("docsorter_classifications_total", source=job.classified_by)
+                doc_type_map = { "Invoice": "Invoices", "Receipt": "Receipts", "Purchase Order": "Purchase Orders" }
+                job.category = doc_type_map.get(job.structured_data.get("document_type"), "Uncategorized")
+                job.final_file_path = self._rename_file_from_data(job.structured_data, job.local_file_path)
 
-            for attachment in attachment_list:
-                filename = attachment.get("filename", "unknown_file")
-                attachment_id = attachment.get("attachmentId")
-                if not attachment_id: continue
+        console.print(f"   - [cyan]   ↳ 🤖 ({job.filename}) Document categorized as:[/cyan] {job.category}")
+        return job
 
-                console.print(f"\n   - [green]Processing attachment:[/green] {filename}")
-                download_result = self.composio.tools.execute(
-                    slug="GMAIL_GET_ATTACHMENT", user_id=self.user_id,
-                    arguments={"message_id": message_id, "attachment_id": attachment_id, "file_name": filename}
-                )
-                if not download_result.get("successful"):
-                    console.print(f"   - [red]❌ Download failed.[/red]"); continue
-                
-                local_file_path = download_result["data"]["file"]
-                console.print(f"   - [bold green]   ↳ ✅ Download successful![/bold green]")
-                
-                document_text = self._extract_text_with_docstrange(local_file_path)
-                final_file_path = local_file_path
-                category = "Uncategorized"
-
-                if document_text:
-                    structured_data = self._extract_structured_data_with_gemini(document_text)
-                    if structured_data:
-                        doc_type_map = { "Invoice": "Invoices", "Receipt": "Receipts", "Purchase Order": "Purchase Orders" }
-                        category = doc_type_map.get(structured_data.get("document_type"), "Uncategorized")
-                        final_file_path = self._rename_file_from_data(structured_data, local_file_path)
-
-                console.print(f"   - [cyan]   ↳ 🤖 Document categorized as:[/cyan] {category}")
-                
-                destination_folder_id = self.folder_ids.get(category)
-                if not destination_folder_id:
-                    console.print(f"   - [red]❌ Could not find a destination folder for '{category}'.[/red]"); continue
-
-                console.print(f"   - [blue]Uploading to Google Drive folder '{category}'...[/blue]")
-                upload_result = self.composio.tools.execute(
-                    slug="GOOGLEDRIVE_UPLOAD_FILE", user_id=self.user_id,
-                    arguments={"file_to_upload": final_file_path, "folder_to_upload_to": destination_folder_id}
+    def _upload_stage(self, job: AttachmentJob) -> AttachmentJob:
+        """Pipeline stage: uploads the file to its Drive folder and cleans up locally."""
+        tenant = self.tenants[job.tenant_id]
+        destination_folder_id = tenant.folder_ids.get(job.category)
+        if not destination_folder_id:
+            raise RuntimeError(f"Could not find a destination folder for '{job.category}'.")
+
+        drive_name = None
+        if self.drive_index:
+            claim = partial(
+                self.drive_index.claim, destination_folder_id, os.path.basename(job.final_file_path),
+                os.path.getsize(job.final_file_path), job.content_hash, job.final_file_path,
+                self.jobs.job_key(job.message_id, job.attachment_id, job.tenant_id),
+            )
+            result, drive_name = claim()
+            if result == "resume":
+                # An interrupted earlier attempt may have uploaded the file; list the folder to find out.
+                self.drive_index.sync_folder(
+                    destination_folder_id, partial(self._list_drive_files, tenant, destination_folder_id)
                 )
+                result, drive_name = claim()
+            if result == "pending":
+                raise RetryLater(f"An identical file is being uploaded as '{drive_name}'.")
+            if result == "duplicate":
+                METRICS.inc("docsorter_drive_uploads_total", result="duplicate")
+                console.print(f"   - [grey50]   ↳ ⏭️ ({job.filename}) Identical file '{drive_name}' is already in "
+                              f"'{job.category}', skipping upload.[/grey50]")
+                self.spool.release(job.final_file_path)
+                job.drive_name = drive_name
+                return job
+            if drive_name != os.path.basename(job.final_file_path):
+                # Drive names the upload after the local file.
+                renamed_path = os.path.join(os.path.dirname(job.final_file_path), drive_name)
+                os.rename(job.final_file_path, renamed_path)
+                job.final_file_path = renamed_path
+                # A retry has to find the file under its new name, or it would download it again.
+                self.jobs.checkpoint(job)
+                METRICS.inc("docsorter_drive_uploads_total", result="renamed")
+                console.print(f"   - [cyan]   ↳ 📝 Name taken in '{job.category}', uploading as:[/cyan] {drive_name}")
+
+        console.print(f"   - [blue]Uploading '{job.filename}' to Google Drive folder '{job.category}'...[/blue]")
+        # A raised error (e.g. a timeout) may come after Drive stored the file, so the reservation is
+        # kept: the retry resumes it and checks the folder first. Only an explicit refusal releases it.
+        upload_result = self.tools.execute(
+            slug="GOOGLEDRIVE_UPLOAD_FILE", user_id=tenant.user_id,
+            arguments={"file_to_upload": job.final_file_path, "folder_to_upload_to": destination_folder_id}
+        )
+        if not upload_result.get("successful"):
+            if drive_name:
+                self.drive_index.abandon(destination_folder_id, drive_name)
+            raise RuntimeError(f"Upload failed: {upload_result.get('error')}")
 
-                if upload_result.get("successful"):
-                    file_name = upload_result.get("data", {}).get("name")
-                    console.print(f"   - [bold green]   ↳ ✅ Successfully uploaded '{file_name}' to Google Drive![/bold green]")
-                    
-                    # Clean up the local file after successful upload
+        file_name = upload_result.get("data", {}).get("name")
+        job.drive_name = drive_name or file_name or os.path.basename(job.final_file_path)
+        job.uploaded = True
+        if drive_name:
+            self.drive_index.complete(destination_folder_id, drive_name, upload_result.get("data", {}).get("id"))
+        METRICS.inc("docsorter_drive_uploads_total", result="uploaded")
+        console.print(f"   - [bold green]   ↳ ✅ Successfully uploaded '{file_name}' to Google Drive![/bold green]")
+
+        # Clean up the local file after successful upload
+        try:
+            self.spool.release(job.final_file_path)
+            console.print(f"   - [grey50]   ↳ 🧹 Cleaned up temporary local file.[/grey50]")
+        except Exception as e:
+            console.print(f"   - [yellow]   ↳ ⚠️ Could not clean up local file {job.final_file_path}: {e}[/yellow]")
+        return job
+
+    def _list_drive_files(self, tenant: Tenant, folder_id: str, modified_after: str | None,
+                          page_token: str | None) -> tuple[list[dict], str | None]:
+        """Lists one page of the files in a Drive folder, optionally only those modified since a time."""
+        query = f"'{folder_id}' in parents and trashed = false"
+        if modified_after:
+            query += f" and modifiedTime >= '{modified_after}'"
+        arguments = {
+            "q": query,
+            "page_size": 1000,
+            "fields": "nextPageToken, files(id, name, size, md5Checksum, modifiedTime)",
+        }
+        if page_token:
+            arguments["page_token"] = page_token
+        response = self.tools.execute(slug="GOOGLEDRIVE_FIND_FILE", user_id=tenant.user_id, arguments=arguments)
+        if not response.get("successful"):
+            raise RuntimeError(f"Could not list Drive folder: {response.get('error')}")
+        data = response.get("data", {})
+        return data.get("files", []), data.get("nextPageToken") or data.get("next_page_token")
+
+    def _sync_drive_index(self):
+        """Keeps the Drive mirror index current until processing stops."""
+        while True:
+            for tenant in list(self.tenants.values()):
+                for category, folder_id in list(tenant.folder_ids.items()):
+                    if self._drive_sync_stop.is_set():
+                        return
+                    full = self.drive_index.needs_full_sync(folder_id, DRIVE_INDEX_FULL_SYNC_SECONDS)
                     try:
-                        os.remove(final_file_path)
-                        console.print(f"   - [grey50]   ↳ 🧹 Cleaned up temporary local file.[/grey50]")
+                        listed = self.drive_index.sync_folder(
+                            folder_id, partial(self._list_drive_files, tenant, folder_id), full=full
+                        )
                     except Exception as e:
-                        console.print(f"   - [yellow]   ↳ ⚠️ Could not clean up local file {final_file_path}: {e}[/yellow]")
-                else:
-                    console.print(f"   - [red]❌ Upload failed.[/red]")
+                        console.print(f"[yellow]   ↳ ⚠️ Could not sync the index of Drive folder '{category}': {e}[/yellow]")
+                        continue
+                    if full:
+                        console.print(f"[grey50]   ↳ 🗂️ Indexed {listed} file(s) in Drive folder '{category}'.[/grey50]")
+            if self._drive_sync_stop.wait(DRIVE_INDEX_SYNC_SECONDS):
+                return
+
+    def _build_pipeline(self, concurrency: int | None = None) -> AttachmentPipeline:
+        """
+        Wires the attachment processing stages into a concurrent pipeline.
+        `concurrency` overrides the worker count of the network-bound stages.
+        """
+        download_workers = concurrency or PIPELINE_DOWNLOAD_WORKERS
+        classify_workers = concurrency or PIPELINE_CLASSIFY_WORKERS
+        upload_workers = concurrency or PIPELINE_UPLOAD_WORKERS
+        extract_workers = PIPELINE_EXTRACT_WORKERS
+        if self.ocr:
+            # Extraction threads only wait on the process pool, so give each OCR worker one.
+            extract_workers = max(extract_workers, self.ocr.workers)
+        if self.batcher:
+            # Each classify worker waits on one document, so fewer workers than the
+            # batch size would keep batches from ever filling up.
+            classify_workers = max(classify_workers, GEMINI_BATCH_MAX_SIZE)
+        return AttachmentPipeline(
+            [
+                Stage("download", self._download_attachment, download_workers),
+                Stage("extract", self._extract_stage, extract_workers),
+                Stage("classify", self._classify_stage, classify_workers),
+                Stage("upload", self._upload_stage, upload_workers),
+            ],
+            queue_size=PIPELINE_QUEUE_SIZE,
+            on_stage_complete=self._record_stage_complete,
+            on_failure=self._record_failure,
+        )
+
+    def _record_stage_complete(self, job: AttachmentJob):
+        """Persists a completed stage and closes out the job's metrics once it is done."""
+        self.jobs.save(job)
+        if job.stage == "done":
+            self.scheduler.release(job)
+            if not job.skip_reason:
+                self._index_document(job)
+            self._finish_job(job, "skipped" if job.skip_reason else "success")
+
+    def _index_document(self, job: AttachmentJob):
+        """Adds a finished document's text and fields to the search index."""
+        if not self.search_index or not job.content_hash or not job.document_text:
+            return
+        try:
+            self.search_index.add(
+                job.tenant_id, job.content_hash, job.document_text, job.structured_data,
+                message_id=job.message_id, filename=job.filename, drive_name=job.drive_name, category=job.category,
+                classified_by=job.classified_by, keep_existing=not job.uploaded,
+            )
+        except Exception as e:
+            console.print(f"   - [yellow]   ↳ ⚠️ ({job.filename}) Could not add document to the search index: {e}[/yellow]")
+
+    def _finish_job(self, job: AttachmentJob, outcome: str):
+        METRICS.inc("docsorter_attachments_total", outcome=outcome, tenant=job.tenant_id)
+        if self.trace_log:
+            self.trace_log.write({
+                "tenant_id": job.tenant_id,
+                "message_id": job.message_id,
+                "attachment_id": job.attachment_id,
+                "filename": job.filename,
+                "outcome": outcome,
+                "content_hash": job.content_hash,
+                "classified_by": job.classified_by,
+                "category": job.category,
+                "skip_reason": job.skip_reason,
+                "stages": job.trace,
+            })
+
+    def _record_failure(self, job: AttachmentJob, error: Exception):
+        """Schedules a retry of the failed stage, or gives up once attempts run out."""
+        self.scheduler.release(job)
+        if isinstance(error, RetryLater):
+            delay = self.jobs.retry_base_seconds if error.delay is None else error.delay
+            self.jobs.defer(job, delay, str(error))
+            console.print(f"   - [yellow]   ↳ ⏸️ ({job.filename}) Waiting {delay:.0f}s before retrying '{job.stage}'.[/yellow]")
+            return
+        delay = self.jobs.fail(job, str(error))
+        if delay is None:
+            self.spool.release(job.final_file_path or job.local_file_path)
+            self._finish_job(job, "failed")
+            console.print(f"   - [bold red]   ↳ ❌ ({job.filename}) Giving up after {self.jobs.max_attempts} attempts.[/bold red]")
+        else:
+            console.print(f"   - [yellow]   ↳ 🔁 ({job.filename}) Retrying '{job.stage}' in {delay:.0f}s.[/yellow]")
+
+    def enqueue_attachment(self, message_id: str, attachment: dict, submit: bool = True,
+                           tenant_id: str = DEFAULT_TENANT_ID, sender: str | None = None) -> bool:
+        """
+        Persists an attachment job and hands it to the pipeline, unless it was seen
+        before or is filtered out as a non-document. Returns whether the
+        attachment was queued. With `submit=False` the job is only persisted, to
+        be picked up by the next start.
+        """
+        attachment_id = attachment.get("attachmentId")
+        if not attachment_id: return False
+        reason = self.attachment_filter.reject_reason(attachment) if self.attachment_filter else None
+        if reason:
+            METRICS.inc("docsorter_attachments_filtered_total", reason=reason)
+            console.print(f"   - [grey50]Skipping non-document attachment ({reason}):[/grey50] {attachment.get('filename')}")
+            return False
+        job = AttachmentJob(
+            message_id=message_id,
+            attachment_id=attachment_id,
+            filename=attachment.get("filename", "unknown_file"),
+            tenant_id=tenant_id,
+            sender=sender,
+        )
+        if not self.jobs.enqueue(job):
+            console.print(f"   - [grey50]Skipping already queued attachment:[/grey50] {job.filename}")
+            return False
+        if submit:
+            self.scheduler.submit(job)
+        return True
+
+    def resume_due_jobs(self):
+        """Hands jobs that are due for a retry (or left over from a restart) back to the scheduler."""
+        for tenant_id in self.tenants:
+            # Claim only what the tenant's backlog has room for, so this never blocks.
+            for job in self.jobs.claim_due(limit=self.scheduler.room(tenant_id), tenant_id=tenant_id):
+                # A job resumed after a restart may have lost its local file; fetch it again.
+                if job.stage != "download" and not os.path.exists(job.final_file_path or job.local_file_path or ""):
+                    job.stage = "download"
+                console.print(f"   - [yellow]Resuming '{job.filename}' at stage '{job.stage}'.[/yellow]")
+                self.scheduler.submit(job)
+
+    def handle_email_event(self, data: dict, submit: bool = True, tenant_id: str = DEFAULT_TENANT_ID):
+        """Queues every attachment of a new-message trigger event for the tenant it came from."""
+        email_payload = data.get("payload", {})
+        message_id = email_payload.get("message_id")
+        attachment_list = email_payload.get("attachment_list", [])
+        sender = email_payload.get("sender")
+
+        if not message_id or not attachment_list: return
+
+        for attachment in attachment_list:
+            self.enqueue_attachment(message_id, attachment, submit, tenant_id, sender)
+
+    def subscribe(self, handler: Callable[[str, dict], None]):
+        """Subscribes to every tenant's trigger; `handler` is called with the tenant ID and the event."""
+        self._event_handler = handler
+        self.subscription = self.composio.triggers.subscribe()
+        for tenant in self.tenants.values():
+            self._subscribe_tenant(tenant)
+
+    def _subscribe_tenant(self, tenant: Tenant):
+        self.subscription.handle(trigger_id=tenant.trigger_id)(partial(self._event_handler, tenant.tenant_id))
+
+    def start_processing(self, concurrency: int | None = None, serve_metrics: bool = True):
+        """
+        Starts the attachment pipeline and requeues jobs left over from a previous
+        run. `serve_metrics=False` leaves the metrics endpoint to another process,
+        like the agent a backfill runs next to.
+        """
+        self.pipeline = self._build_pipeline(concurrency)
+        self.pipeline.start()
+        for tenant in self.tenants.values():
+            self.scheduler.add_tenant(tenant.tenant_id, tenant.max_concurrency, tenant.weight)
+        self.scheduler.start(self.pipeline.submit)
+        METRICS.register_gauge(
+            "docsorter_tenant_jobs",
+            lambda: {
+                key: count for tenant_id, (waiting, in_flight) in self.scheduler.depths().items()
+                for key, count in (((("tenant", tenant_id), ("state", "waiting")), waiting),
+                                   ((("tenant", tenant_id), ("state", "in_flight")), in_flight))
+            },
+        )
+        METRICS.register_gauge(
+            "docsorter_queue_depth",
+            lambda: {(("stage", name),): depth for name, depth in self.pipeline.queue_depths().items()},
+        )
+        METRICS.register_gauge(
+            "docsorter_jobs", lambda: {(("status", status),): count for status, count in self.jobs.counts().items()}
+        )
+        if self.drive_index:
+            self._drive_sync_stop.clear()
+            threading.Thread(target=self._sync_drive_index, name="drive-index-sync", daemon=True).start()
+        if serve_metrics and METRICS_PORT and not self.metrics_server:
+            try:
+                self.metrics_server = start_metrics_server(METRICS_PORT, METRICS_HOST)
+            except OSError as e:
+                console.print(f"[yellow]⚠️ Could not serve metrics on port {METRICS_PORT}: {e}[/yellow]")
+        orphans = self.spool.remove_orphans(self.jobs.active_file_paths())
+        if orphans:
+            console.print(f"[grey50]   ↳ 🧹 Removed {orphans} spooled attachment(s) left by a previous run.[/grey50]")
+        recovered = self.jobs.recover()
+        if recovered:
+            console.print(f"[yellow]Resuming {recovered} unfinished job(s) from the previous run.[/yellow]")
 
+    def stop_processing(self, timeout: float | None = None) -> bool:
+        """
+        Lets queued and in-flight attachments finish, then stops the pipeline.
+        Returns False if they didn't finish within the timeout; those jobs stay
+        in the durable queue and are resumed on the next start.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._drive_sync_stop.set()
+        drained = self.scheduler.stop(timeout)
+        drained = self.pipeline.stop(None if deadline is None else max(0.0, deadline - time.monotonic())) and drained
+        if drained:
+            if self.batcher:
+                self.batcher.close()
+            if self.ocr:
+                self.ocr.close()
+        else:
+            self.abandon_processing()
+        return drained
+
+    def abandon_processing(self):
+        """
+        Stops Gemini batches and OCR extractions still in flight without waiting
+        for them, so the process can exit at the shutdown deadline. Their jobs
+        stay 'running' in the durable queue and are resumed on the next start.
+        """
+        self._drive_sync_stop.set()
+        if self.batcher:
+            self.batcher.close(wait=False)
+        if self.ocr:
+            self.ocr.close(wait=False)
+
+    def start_listening(self):
+        """Starts the main listening loop for the agent."""
+        if not self.tenants or not all(tenant.trigger_id for tenant in self.tenants.values()):
+            console.print("[bold red]Agent cannot listen: Trigger ID was not set during initialization.[/bold red]")
+            return
+
+        trigger_ids = ", ".join(tenant.trigger_id for tenant in self.tenants.values())
+        console.print(f"👂 Agent is now listening for trigger(s) '[bold yellow]{trigger_ids}[/bold yellow]'...")
+        console.print("Press [bold red]Ctrl+C[/bold red] to stop the agent.")
+        AgentRuntime(self, SHUTDOWN_TIMEOUT_SECONDS, EVENT_WORKERS).run()
+
+    def backfill(self, after: str | None = None, before: str | None = None, label_ids: list[str] | None = None,
+                 query: str = "", concurrency: int | None = None, page_size: int = 100,
+                 max_messages: int | None = None, restart: bool = False, tenant_id: str = DEFAULT_TENANT_ID):
+        """Processes a tenant's existing messages with attachments, resuming from the last checkpoint."""
+        if tenant_id not in self.tenants:
+            console.print(f"[bold red]❌ Unknown tenant '{tenant_id}'. Known tenants: {', '.join(self.tenants)}[/bold red]")
+            return
+        backfiller = Backfiller(
+            self, STATE_DIR, build_gmail_query(after, before, query), label_ids, page_size, self.tenants[tenant_id]
+        )
+        if restart:
+            backfiller.reset()
+
+        console.print(f"📥 Backfilling messages matching '[bold yellow]{backfiller.query}[/bold yellow]'...")
+        console.print("Press [bold red]Ctrl+C[/bold red] to pause; the next run resumes where this one stopped.")
         try:
-            while True: 
-                time.sleep(1)
+            # The agent may be running next to this backfill and already serve metrics on the port.
+            self.start_processing(concurrency, serve_metrics=False)
+            backfiller.run(max_messages)
         except KeyboardInterrupt:
-            console.print("\n[bold red]Shutdown signal received. Stopping agent...[/bold red]")
\ No newline at end of file
+            console.print("\n[bold red]Backfill interrupted. Finishing in-flight attachments...[/bold red]")
+        except Exception as e:
+            console.print(f"[bold red]❌ Backfill stopped: {e}[/bold red]")
+        finally:
+            self.stop_processing()
+        console.print("[bold green]✅ Backfill run finished. Attachments waiting for a retry resume on the next run.[/bold green]")
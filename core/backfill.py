@@ -0,0 +1,140 @@
+# agent_name/core/backfill.py
+
+import hashlib
+import json
+import os
+from rich.console import Console
+
+from .tenants import DEFAULT_TENANT_ID, Tenant
+
+console = Console()
+
+
+def build_gmail_query(after: str | None = None, before: str | None = None, query: str = "") -> str:
+    """Builds a Gmail search query for messages with attachments in a date range."""
+    parts = ["has:attachment"]
+    if after:
+        parts.append(f"after:{after.replace('-', '/')}")
+    if before:
+        parts.append(f"before:{before.replace('-', '/')}")
+    if query:
+        parts.append(query)
+    return " ".join(parts)
+
+
+class Backfiller:
+    """
+    Pages through existing Gmail messages with attachments and feeds them into
+    the agent's attachment pipeline, exactly as if they had just arrived.
+
+    Progress is checkpointed to a JSON file after every page, keyed by the
+    tenant and the search, so an interrupted backfill resumes from the page it
+    stopped at.
+    Jobs are deduplicated by the agent's durable queue, so re-reading a page
+    after a crash never processes an attachment twice.
+    """
+    def __init__(self, agent, state_dir: str, query: str, label_ids: list[str] | None = None,
+                 page_size: int = 100, tenant: Tenant | None = None):
+        self.agent = agent
+        self.query = query
+        self.label_ids = label_ids or []
+        self.page_size = page_size
+        self.tenant = tenant or agent.tenants[DEFAULT_TENANT_ID]
+        search = [query, sorted(self.label_ids)]
+        if self.tenant.tenant_id != DEFAULT_TENANT_ID:
+            # Default-tenant checkpoints keep their original key so existing backfills resume.
+            search.append(self.tenant.tenant_id)
+        search_key = hashlib.sha256(json.dumps(search).encode()).hexdigest()[:16]
+        self.checkpoint_path = os.path.join(state_dir, f"backfill-{search_key}.json")
+        self.checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> dict:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return {"query": self.query, "label_ids": self.label_ids, "page_token": None,
+                "messages_seen": 0, "attachments_queued": 0, "complete": False}
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def reset(self):
+        """Discards saved progress so the next run starts from the newest message."""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.checkpoint = self._load_checkpoint()
+
+    def _fetch_page(self, page_token: str | None) -> tuple[list[dict], str | None]:
+        arguments = {
+            "user_id": "me",
+            "query": self.query,
+            "max_results": self.page_size,
+            # The attachment list is part of the payload; without it every message looks attachment-free.
+            "include_payload": True,
+        }
+        if self.label_ids:
+            arguments["label_ids"] = self.label_ids
+        if page_token:
+            arguments["page_token"] = page_token
+        response = self.agent.tools.execute(
+            slug="GMAIL_FETCH_EMAILS", user_id=self.tenant.user_id, arguments=arguments
+        )
+        if not response.get("successful"):
+            raise RuntimeError(f"Could not list messages: {response.get('error')}")
+        data = response.get("data", {})
+        return data.get("messages", []), data.get("nextPageToken") or data.get("next_page_token")
+
+    def _message_attachments(self, message: dict, message_id: str) -> list[dict]:
+        """Returns a listed message's attachments, fetching the full message if the listing left them out."""
+        for key in ("attachmentList", "attachment_list"):
+            if key in message:
+                return message[key] or []
+        response = self.agent.tools.execute(
+            slug="GMAIL_FETCH_MESSAGE_BY_MESSAGE_ID", user_id=self.tenant.user_id,
+            arguments={"user_id": "me", "message_id": message_id, "format": "full"},
+        )
+        if not response.get("successful"):
+            raise RuntimeError(f"Could not fetch message {message_id}: {response.get('error')}")
+        data = response.get("data", {})
+        return data.get("attachmentList") or data.get("attachment_list") or []
+
+    def run(self, max_messages: int | None = None):
+        """Queues attachments page by page until the search is exhausted or max_messages is reached."""
+        if self.checkpoint["complete"]:
+            console.print("[green]✓ This backfill has already completed. Use --restart to run it again.[/green]")
+            return
+        if self.checkpoint["messages_seen"]:
+            console.print(f"[yellow]Resuming backfill after {self.checkpoint['messages_seen']} messages...[/yellow]")
+
+        seen_this_run = 0
+        while True:
+            messages, next_page_token = self._fetch_page(self.checkpoint["page_token"])
+            for message in messages:
+                message_id = message.get("messageId") or message.get("message_id") or message.get("id")
+                sender = message.get("sender") or message.get("from")
+                if not message_id: continue
+                attachments = self._message_attachments(message, message_id)
+                for attachment in attachments:
+                    if self.agent.enqueue_attachment(message_id, attachment, tenant_id=self.tenant.tenant_id,
+                                                     sender=sender):
+                        self.checkpoint["attachments_queued"] += 1
+
+            # Every attachment on the page is in the durable queue now, so it is
+            # safe to move the checkpoint past it.
+            self.checkpoint["messages_seen"] += len(messages)
+            self.checkpoint["page_token"] = next_page_token
+            self.checkpoint["complete"] = not next_page_token
+            self._save_checkpoint()
+            seen_this_run += len(messages)
+            console.print(
+                f"[cyan]Backfill progress:[/cyan] {self.checkpoint['messages_seen']} messages scanned, "
+                f"{self.checkpoint['attachments_queued']} attachments queued."
+            )
+            self.agent.resume_due_jobs()
+
+            if self.checkpoint["complete"] or (max_messages and seen_this_run >= max_messages):
+                break
@@ -0,0 +1,119 @@
+# agent_name/core/batching.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+from rich.console import Console
+
+console = Console()
+
+
+class GeminiBatcher:
+    """
+    Collects classification requests that arrive within a short window and
+    sends them to Gemini as one prompt.
+
+    A batch is dispatched once it reaches max_batch_size or max_wait_ms after
+    its first document arrived, whichever comes first, so the extra latency
+    per document is bounded by the window. Documents missing from a batch
+    response (or every document, if the response can't be parsed) are
+    retried one at a time with the single-document call.
+
+    Batches are sent from daemon threads, so a shutdown that stops waiting
+    doesn't also have to wait for Gemini calls still in flight.
+    """
+    def __init__(
+        self,
+        run_batch: Callable[[list[str]], list[dict | None] | None],
+        run_single: Callable[[str], dict | None],
+        max_batch_size: int = 10,
+        max_wait_ms: int = 250,
+        max_in_flight: int = 4,
+    ):
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: queue.Queue = queue.Queue()
+        self._batches: queue.Queue = queue.Queue()
+        self._senders = [
+            threading.Thread(target=self._send_batches, name=f"gemini-batch-{n}", daemon=True)
+            for n in range(max(1, max_in_flight))
+        ]
+        for sender in self._senders:
+            sender.start()
+        self._collector = threading.Thread(target=self._collect, name="gemini-batcher", daemon=True)
+        self._collector.start()
+
+    def submit(self, document_text: str) -> Future:
+        """Queues a document for the next batch and returns a future for its result."""
+        future = Future()
+        self._pending.put((document_text, future))
+        return future
+
+    def classify(self, document_text: str) -> dict | None:
+        """Blocking helper: submits a document and waits for its result."""
+        return self.submit(document_text).result()
+
+    def close(self, wait: bool = True):
+        """
+        Flushes pending documents and stops the batcher. Without waiting, it
+        returns at once and batches still being sent are abandoned.
+        """
+        self._pending.put(None)
+        if not wait:
+            return
+        self._collector.join()
+        for _ in self._senders:
+            self._batches.put(None)
+        for sender in self._senders:
+            sender.join()
+
+    def _send_batches(self):
+        while True:
+            batch = self._batches.get()
+            if batch is None:
+                return
+            self._dispatch(batch)
+
+    def _collect(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._batches.put(batch)
+                    return
+                batch.append(item)
+            self._batches.put(batch)
+
+    def _dispatch(self, batch: list[tuple[str, Future]]):
+        results = None
+        if len(batch) > 1:
+            try:
+                results = self.run_batch([text for text, _ in batch])
+            except Exception as e:
+                console.print(f"[yellow]   - ⚠️ Batched Gemini call failed, retrying individually: {e}[/yellow]")
+            if results is not None:
+                console.print(f"   - [blue]   ↳ 🤖 Classified {len(batch)} documents in one Gemini call.[/blue]")
+
+        for index, (text, future) in enumerate(batch):
+            result = results[index] if results and index < len(results) else None
+            try:
+                if result is None:
+                    result = self.run_single(text)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,100 @@
+# agent_name/core/cache.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from rich.console import Console
+
+console = Console()
+
+
+class ResultCache:
+    """
+    A persistent, content-addressed cache of extraction results.
+
+    Entries are keyed by the SHA-256 of the downloaded file and hold the
+    DocStrange markdown and the parsed Gemini JSON. The cache is bounded by
+    the total size of the stored entries, evicting the least recently used
+    ones first, and entries older than the TTL are treated as misses.
+    """
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                content_hash TEXT PRIMARY KEY,
+                markdown TEXT,
+                structured_data TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+        self._db.commit()
+
+    def get(self, content_hash: str) -> tuple[str | None, dict | None] | None:
+        """Returns (markdown, structured_data) for a hash, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT markdown, structured_data, created_at FROM results WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchone()
+            if row is None:
+                return None
+            markdown, structured_data, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._db.execute("DELETE FROM results WHERE content_hash = ?", (content_hash,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE results SET accessed_at = ? WHERE content_hash = ?", (now, content_hash)
+            )
+            self._db.commit()
+        return markdown, json.loads(structured_data) if structured_data else None
+
+    def put(self, content_hash: str, markdown: str | None, structured_data: dict | None):
+        """Stores the results for a hash and evicts old entries if over budget."""
+        data_json = json.dumps(structured_data) if structured_data else None
+        size = len((markdown or "").encode()) + len((data_json or "").encode())
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO results
+                    (content_hash, markdown, structured_data, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (content_hash, markdown, data_json, size, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drops expired entries, then least recently used ones until under budget."""
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT content_hash, size FROM results ORDER BY accessed_at").fetchall()
+        stale = []
+        for content_hash, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((content_hash,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE content_hash = ?", stale)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,215 @@
+# agent_name/core/classifier.py
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from rich.console import Console
+
+console = Console()
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+except ImportError:  # scikit-learn is optional; keyword scoring still works without it
+    make_pipeline = None
+
+DOCUMENT_TYPES = ("Invoice", "Receipt", "Purchase Order")
+
+# Phrases that point at a document type, with their weight.
+KEYWORDS = {
+    "Invoice": {
+        "invoice": 2.0, "invoice number": 2.0, "invoice date": 1.5, "bill to": 1.0,
+        "amount due": 1.5, "balance due": 1.5, "due date": 1.0, "payment terms": 1.0,
+    },
+    "Receipt": {
+        "receipt": 2.0, "receipt number": 2.0, "payment received": 1.5, "amount paid": 1.5,
+        "paid with": 1.0, "change due": 1.5, "thank you for your purchase": 1.0, "cashier": 1.0,
+    },
+    "Purchase Order": {
+        "purchase order": 2.5, "po number": 2.0, "p.o.": 1.5, "ship to": 1.0,
+        "delivery date": 1.0, "requested by": 1.0, "order date": 0.5,
+    },
+}
+
+# Documents that mention invoice, receipt or order keywords without being one, e.g. a credit
+# note quoting the invoice it refunds. Keywords alone can't tell them apart, so Gemini decides.
+_LOOKALIKE_PATTERN = re.compile(
+    r"\b(?:credit\s+(?:note|memo)|debit\s+note|statement|quotation|quote|estimate|pro[\s-]?forma|remittance)\b",
+    re.IGNORECASE,
+)
+# Highest confidence given to a document with one of the phrases above in its header.
+_LOOKALIKE_MAX_CONFIDENCE = 0.5
+
+_ID_PATTERN = re.compile(
+    r"(?:invoice|receipt|order|po|p\.o\.|document)\s*(?:no\.?|number|num|#|id)?\s*[:#.]?\s*"
+    r"((?=[A-Z\-/]*\d)[A-Z0-9][A-Z0-9\-/]{2,})",
+    re.IGNORECASE,
+)
+_TOTAL_PATTERN = re.compile(
+    r"\b(?:grand\s+total|total\s+(?:amount|due|paid)|amount\s+(?:due|paid)|balance\s+due|total)"
+    r"[^0-9\n]{0,20}?([0-9]{1,3}(?:[,\s][0-9]{3})*(?:\.[0-9]{2})|[0-9]+(?:\.[0-9]{2}))",
+    re.IGNORECASE,
+)
+_DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4}-\d{2}-\d{2})\b"), ("%Y-%m-%d",)),
+    (re.compile(r"\b([A-Z][a-z]{2,8}\.? \d{1,2},? \d{4})\b"), ("%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%b. %d, %Y")),
+    (re.compile(r"\b(\d{1,2} [A-Z][a-z]{2,8}\.? \d{4})\b"), ("%d %B %Y", "%d %b %Y", "%d %b. %Y")),
+    (re.compile(r"\b(\d{1,2}/\d{1,2}/\d{4})\b"), ("%d/%m/%Y", "%m/%d/%Y")),
+)
+
+
+def _parse_date(text: str) -> str | None:
+    """Finds the first unambiguous date in the text and returns it as YYYY-MM-DD."""
+    for pattern, formats in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            candidates = set()
+            for fmt in formats:
+                try:
+                    candidates.add(datetime.strptime(match.group(1), fmt).date().isoformat())
+                except ValueError:
+                    continue
+            # Slashed dates like 03/04/2024 parse both ways; skip them rather than guess.
+            if len(candidates) == 1:
+                return candidates.pop()
+    return None
+
+
+def _parse_amount(text: str) -> float | None:
+    """Returns the last 'total'-style amount in the text, where final totals usually live."""
+    matches = _TOTAL_PATTERN.findall(text)
+    if not matches:
+        return None
+    try:
+        return float(re.sub(r"[,\s]", "", matches[-1]))
+    except ValueError:
+        return None
+
+
+def _guess_vendor(text: str) -> str | None:
+    """Uses the first heading-like line that isn't a document-type keyword as the vendor."""
+    for line in text.splitlines()[:15]:
+        line = line.strip().lstrip("#*|- ").rstrip("*| ").strip()
+        if not line or len(line) > 60 or any(ch.isdigit() for ch in line):
+            continue
+        if any(keyword in line.lower() for keywords in KEYWORDS.values() for keyword in keywords):
+            continue
+        return line
+    return None
+
+
+class LocalClassifier:
+    """
+    Classifies documents and extracts their key fields without an LLM call.
+
+    Document types are scored from weighted keywords and, when scikit-learn is
+    installed, a TF-IDF + logistic regression model fitted on previously
+    accepted Gemini results. Fields are pulled out with regular expressions.
+    The returned confidence is used by the agent to decide whether the local
+    result is good enough or the document should be escalated to Gemini.
+    """
+    def __init__(self, path: str, min_training_samples: int = 50, max_training_samples: int = 20000,
+                 retrain_every: int = 25):
+        self.min_training_samples = min_training_samples
+        self.max_training_samples = max_training_samples
+        self.retrain_every = retrain_every
+        self._model = None
+        self._new_samples = 0
+        self._lock = threading.Lock()
+        self._train_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS samples (id INTEGER PRIMARY KEY, text TEXT NOT NULL, document_type TEXT NOT NULL)"
+        )
+        self._db.commit()
+        threading.Thread(target=self._train, name="classifier-train", daemon=True).start()
+
+    def classify(self, document_text: str) -> tuple[dict, float]:
+        """Returns the locally extracted fields and a confidence between 0 and 1."""
+        text = document_text.lower()
+        head = text[:500]
+        scores = {}
+        for doc_type, keywords in KEYWORDS.items():
+            score = 0.0
+            for keyword, weight in keywords.items():
+                hits = text.count(keyword)
+                if hits:
+                    # A keyword in the header counts double; repeats add a little.
+                    score += weight * (2.0 if keyword in head else 1.0) + 0.25 * min(hits - 1, 4)
+            scores[doc_type] = score
+
+        best_type = max(scores, key=scores.get)
+        best, total = scores[best_type], sum(scores.values())
+        type_confidence = 0.0 if not best else (best / total) * min(1.0, best / 4.0)
+
+        model = self._model
+        if model is not None:
+            probabilities = dict(zip(model.classes_, model.predict_proba([document_text[:20000]])[0]))
+            model_type = max(probabilities, key=probabilities.get)
+            if model_type == best_type:
+                type_confidence = max(type_confidence, (type_confidence + probabilities[model_type]) / 2)
+            elif probabilities[model_type] > type_confidence:
+                best_type, type_confidence = model_type, probabilities[model_type] * 0.8
+            else:
+                type_confidence *= 0.8
+
+        if _LOOKALIKE_PATTERN.search(head):
+            type_confidence = min(type_confidence, _LOOKALIKE_MAX_CONFIDENCE)
+
+        id_match = _ID_PATTERN.search(document_text)
+        fields = {
+            "document_type": best_type if type_confidence else "Other",
+            "vendor_name": _guess_vendor(document_text) or "N/A",
+            "document_id": id_match.group(1) if id_match else "N/A",
+            "document_date": _parse_date(document_text) or "N/A",
+            "total_amount": _parse_amount(document_text),
+        }
+        if fields["total_amount"] is None:
+            fields["total_amount"] = "N/A"
+
+        found = sum(fields[key] != "N/A" for key in ("document_id", "document_date", "total_amount"))
+        return fields, type_confidence * found / 3
+
+    def record(self, document_text: str, structured_data: dict):
+        """Stores an accepted result as a training sample, refitting the model periodically."""
+        doc_type = structured_data.get("document_type")
+        if doc_type not in DOCUMENT_TYPES and doc_type != "Other":
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO samples (text, document_type) VALUES (?, ?)", (document_text[:20000], doc_type)
+            )
+            self._db.commit()
+            self._new_samples += 1
+            due = self._new_samples >= self.retrain_every
+            if due:
+                self._new_samples = 0
+        if due:
+            threading.Thread(target=self._train, name="classifier-train", daemon=True).start()
+
+    def _train(self):
+        """Fits the TF-IDF model on the stored samples, if scikit-learn is available."""
+        if make_pipeline is None or not self._train_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT text, document_type FROM samples ORDER BY id DESC LIMIT ?", (self.max_training_samples,)
+                ).fetchall()
+            labels = {label for _, label in rows}
+            if len(rows) < self.min_training_samples or len(labels) < 2:
+                return
+            model = make_pipeline(
+                TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), max_features=50000),
+                LogisticRegression(max_iter=1000),
+            )
+            model.fit([text for text, _ in rows], [label for _, label in rows])
+            self._model = model
+            console.print(f"[grey50]   ↳ 🧮 Local classifier retrained on {len(rows)} documents.[/grey50]")
+        except Exception as e:
+            console.print(f"[yellow]   ↳ ⚠️ Local classifier training failed: {e}[/yellow]")
+        finally:
+            self._train_lock.release()
@@ -1,20 +1,25 @@
 # agent_name/core/connection.py
 
-from composio import Composio
+from typing import TYPE_CHECKING
 from rich.console import Console
 
+if TYPE_CHECKING:
+    from composio import Composio
+
 console = Console()
 
-def ensure_connection(composio: Composio, user_id: str, auth_config_id: str, app_name: str):
+def ensure_connection(composio: "Composio", user_id: str, auth_config_id: str, app_name: str, connections=None):
     """
     Checks for an active connection or initiates a new one.
-    Returns the connected_account object.
+    Returns the connected_account object. Pass `connections` to reuse an
+    earlier `connected_accounts.list` result instead of listing again.
     """
     console.print(f"Verifying connection for [bold cyan]{app_name}[/bold cyan]...")
 
     # 1. Check for an existing active connection
     try:
-        connections = composio.connected_accounts.list(user_id=user_id)
+        if connections is None:
+            connections = composio.connected_accounts.list(user_id=user_id)
         for conn in connections:
             if conn.auth_config_id == auth_config_id and conn.status == "active":
                 console.print(f"[green]✔ Active {app_name} connection found.[/green]")
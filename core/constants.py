@@ -1,28 +1,190 @@
 # agent_name/core/constants.py
 
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from composio import Composio
 
 # Load environment variables from .env file
 load_dotenv()
 
-# --- Initialize Composio Client ---
+# --- Composio Client ---
 COMPOSIO_API_KEY = os.getenv("COMPOSIO_API_KEY")
 if not COMPOSIO_API_KEY:
     raise ValueError("COMPOSIO_API_KEY is not set in the .env file.")
-COMPOSIO_CLIENT = Composio(api_key=COMPOSIO_API_KEY)
+
+
+@lru_cache(maxsize=None)
+def get_composio_client():
+    """Builds the Composio client on first use, so importing this module stays cheap."""
+    from composio import Composio
+    return Composio(api_key=COMPOSIO_API_KEY)
+
+
+def __getattr__(name):
+    # Keeps `from .constants import COMPOSIO_CLIENT` working without building the client at import time.
+    if name == "COMPOSIO_CLIENT":
+        return get_composio_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- User Configuration ---
 # A unique identifier for the end-user running the agent
 COMPOSIO_USER_ID = os.getenv("COMPOSIO_USER_ID", "default-user")
 
+# --- Tenants ---
+# A JSON file listing the mailboxes to serve (see README). When it is unset,
+# the agent serves the single COMPOSIO_USER_ID mailbox. TENANT_MAX_CONCURRENCY
+# is the default cap on each tenant's attachments in flight (0 = no cap).
+TENANTS_PATH = os.getenv("TENANTS_PATH", "")
+TENANT_MAX_CONCURRENCY = int(os.getenv("TENANT_MAX_CONCURRENCY", "0"))
+
 # --- Auth Config IDs ---
 # These IDs tell Composio which application credentials to use for the OAuth flow.
+# With a tenants file they are only defaults for tenants that don't set their own.
 GMAIL_AUTH_CONFIG_ID = os.getenv("GMAIL_AUTH_CONFIG_ID")
-if not GMAIL_AUTH_CONFIG_ID:
+if not GMAIL_AUTH_CONFIG_ID and not TENANTS_PATH:
     raise ValueError("GMAIL_AUTH_CONFIG_ID is not set in the .env file.")
 
 GOOGLE_DRIVE_AUTH_CONFIG_ID = os.getenv("GOOGLE_DRIVE_AUTH_CONFIG_ID")
-if not GOOGLE_DRIVE_AUTH_CONFIG_ID:
-    raise ValueError("GOOGLE_DRIVE_AUTH_CONFIG_ID is not set in the .env file.")
\ No newline at end of file
+if not GOOGLE_DRIVE_AUTH_CONFIG_ID and not TENANTS_PATH:
+    raise ValueError("GOOGLE_DRIVE_AUTH_CONFIG_ID is not set in the .env file.")
+
+# --- Attachment Filtering ---
+# Attachments are skipped before download when their payload metadata shows
+# they aren't documents (calendar invites, signatures, inline logos, images
+# under ATTACHMENT_MIN_IMAGE_BYTES, files over ATTACHMENT_MAX_BYTES), and
+# after download when their leading bytes don't match a supported format.
+ATTACHMENT_FILTER_ENABLED = os.getenv("ATTACHMENT_FILTER_ENABLED", "true").lower() == "true"
+ATTACHMENT_EXTENSIONS = tuple(
+    ext.strip() if ext.strip().startswith(".") else f".{ext.strip()}"
+    for ext in os.getenv(
+        "ATTACHMENT_EXTENSIONS", "pdf,png,jpg,jpeg,tif,tiff,bmp,webp,docx,doc,xlsx,xls,pptx,ppt,txt,csv,html,htm"
+    ).split(",") if ext.strip()
+)
+ATTACHMENT_MIN_IMAGE_BYTES = int(os.getenv("ATTACHMENT_MIN_IMAGE_BYTES", "15000"))
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# --- Pipeline Configuration ---
+# Worker threads per attachment processing stage and the capacity of the
+# queue in front of each stage. Extraction defaults to a single thread for the
+# shared in-process extractor; with the OCR process pool enabled it is raised
+# to one thread per OCR worker.
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv("PIPELINE_DOWNLOAD_WORKERS", "4"))
+PIPELINE_EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "1"))
+PIPELINE_CLASSIFY_WORKERS = int(os.getenv("PIPELINE_CLASSIFY_WORKERS", "4"))
+PIPELINE_UPLOAD_WORKERS = int(os.getenv("PIPELINE_UPLOAD_WORKERS", "4"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+
+# --- Local State ---
+# Directory for the agent's local databases (result cache, queues, indexes).
+STATE_DIR = os.getenv("STATE_DIR", ".document_sorter")
+
+# --- Attachment Spool ---
+# Downloaded attachments are moved into a private scratch directory in one
+# read that also hashes them. Files up to SPOOL_MAX_MEMORY_BYTES go to
+# SPOOL_MEMORY_DIR (a tmpfs by default where one exists); larger ones, and
+# any that would take the files held in RAM past SPOOL_MAX_MEMORY_TOTAL_BYTES
+# or fill the tmpfs, go to SPOOL_DISK_DIR.
+SPOOL_MEMORY_DIR = os.getenv("SPOOL_MEMORY_DIR", "")
+SPOOL_DISK_DIR = os.getenv("SPOOL_DISK_DIR", os.path.join(STATE_DIR, "spool"))
+SPOOL_MAX_MEMORY_BYTES = int(os.getenv("SPOOL_MAX_MEMORY_BYTES", str(32 * 1024 * 1024)))
+SPOOL_MAX_MEMORY_TOTAL_BYTES = int(os.getenv("SPOOL_MAX_MEMORY_TOTAL_BYTES", str(256 * 1024 * 1024)))
+
+# --- Result Cache ---
+# Extraction and classification results keyed by the SHA-256 of each file.
+# CACHE_TTL_SECONDS=0 keeps entries until they are evicted for space.
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(STATE_DIR, "results.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+
+# --- Local Classifier ---
+# Keyword/regex scoring plus an optional TF-IDF model trained on accepted
+# Gemini results. Documents scoring below the threshold go to Gemini.
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", os.path.join(STATE_DIR, "classifier.sqlite3"))
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+
+# --- Vendor Templates ---
+# Per-sender/layout extraction rules learned from Gemini results. A template
+# is used once it has reproduced Gemini's answer this many more times.
+TEMPLATES_ENABLED = os.getenv("TEMPLATES_ENABLED", "true").lower() == "true"
+TEMPLATES_PATH = os.getenv("TEMPLATES_PATH", os.path.join(STATE_DIR, "templates.sqlite3"))
+TEMPLATE_MIN_CONFIRMATIONS = int(os.getenv("TEMPLATE_MIN_CONFIRMATIONS", "1"))
+
+# --- Gemini Batching ---
+# Documents that reach Gemini within the same window are classified with a
+# single call. The window closes at the max size or after the max wait.
+GEMINI_BATCH_ENABLED = os.getenv("GEMINI_BATCH_ENABLED", "true").lower() == "true"
+GEMINI_BATCH_MAX_SIZE = int(os.getenv("GEMINI_BATCH_MAX_SIZE", "10"))
+GEMINI_BATCH_MAX_WAIT_MS = int(os.getenv("GEMINI_BATCH_MAX_WAIT_MS", "250"))
+
+# --- Gemini Context ---
+# Most characters of document text sent to Gemini per document. Longer
+# documents are reduced to their most invoice-relevant segments.
+GEMINI_CONTEXT_MAX_CHARS = int(os.getenv("GEMINI_CONTEXT_MAX_CHARS", "6000"))
+
+# --- Durable Job Queue ---
+# Attachment jobs are persisted so they survive restarts; a failed stage is
+# retried with exponential backoff starting at JOB_RETRY_BASE_SECONDS.
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(STATE_DIR, "jobs.sqlite3"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+
+# --- Composio Call Throttling ---
+# Per-tool token buckets written as 'SLUG=calls_per_second/burst,...'; tools
+# not listed use TOOL_DEFAULT_RATE_LIMIT. Concurrency per tool adapts between
+# 1 and TOOL_MAX_CONCURRENCY, halving whenever a call is rate limited.
+TOOL_RATE_LIMITS = os.getenv(
+    "TOOL_RATE_LIMITS",
+    "GEMINI_GENERATE_CONTENT=2/5,GMAIL_GET_ATTACHMENT=10/20,GOOGLEDRIVE_UPLOAD_FILE=5/10,GOOGLEDRIVE_FIND_FOLDER=5/10",
+)
+TOOL_DEFAULT_RATE_LIMIT = os.getenv("TOOL_DEFAULT_RATE_LIMIT", "10/20")
+TOOL_INITIAL_CONCURRENCY = int(os.getenv("TOOL_INITIAL_CONCURRENCY", "4"))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "32"))
+TOOL_MAX_RETRIES = int(os.getenv("TOOL_MAX_RETRIES", "4"))
+
+# --- Observability ---
+# Prometheus-format metrics are served at http://METRICS_HOST:METRICS_PORT/metrics
+# (METRICS_PORT=0 disables the endpoint). When TRACE_PATH is set, one JSON
+# line with per-stage timings is appended to it for every finished attachment.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+
+# --- Drive Mirror Index ---
+# A local index of the files in each Drive folder, used to skip identical
+# uploads and pick free file names without listing Drive. It is refreshed
+# with files changed since the last sync every DRIVE_INDEX_SYNC_SECONDS and
+# fully relisted every DRIVE_INDEX_FULL_SYNC_SECONDS.
+DRIVE_INDEX_ENABLED = os.getenv("DRIVE_INDEX_ENABLED", "true").lower() == "true"
+DRIVE_INDEX_PATH = os.getenv("DRIVE_INDEX_PATH", os.path.join(STATE_DIR, "drive_index.sqlite3"))
+DRIVE_INDEX_SYNC_SECONDS = float(os.getenv("DRIVE_INDEX_SYNC_SECONDS", "300"))
+DRIVE_INDEX_FULL_SYNC_SECONDS = float(os.getenv("DRIVE_INDEX_FULL_SYNC_SECONDS", str(24 * 60 * 60)))
+
+# --- Search Index ---
+# Extracted text and fields of every processed document, searchable with
+# `python main.py search`.
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(STATE_DIR, "search.sqlite3"))
+
+# --- Startup State ---
+# Connection, trigger and folder IDs are cached here so restarts skip the setup
+# round trips; the cached values are revalidated in the background.
+STARTUP_CACHE_ENABLED = os.getenv("STARTUP_CACHE_ENABLED", "true").lower() == "true"
+STARTUP_STATE_PATH = os.getenv("STARTUP_STATE_PATH", os.path.join(STATE_DIR, "startup_state.json"))
+
+# --- OCR Engine ---
+# DocStrange runs in OCR_WORKERS processes, each with its own extractor
+# (0 keeps a single in-process extractor). PDFs with at least
+# OCR_SPLIT_MIN_PAGES pages are extracted in parallel chunks of
+# OCR_PAGES_PER_CHUNK pages; splitting requires the optional pypdf package.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_PAGES_PER_CHUNK = int(os.getenv("OCR_PAGES_PER_CHUNK", "10"))
+OCR_SPLIT_MIN_PAGES = int(os.getenv("OCR_SPLIT_MIN_PAGES", "20"))
+
+# --- Runtime ---
+# Trigger events are queued into the pipeline by EVENT_WORKERS consumers on an
+# asyncio loop. On Ctrl+C or SIGTERM, in-flight attachments get up to
+# SHUTDOWN_TIMEOUT_SECONDS to finish; the rest resume on the next start.
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "4"))
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "30"))
@@ -0,0 +1,102 @@
+# agent_name/core/context.py
+
+import re
+
+from .classifier import KEYWORDS, _DATE_PATTERNS, _ID_PATTERN, _TOTAL_PATTERN
+
+# Currency-looking numbers, e.g. 1,234.50 or $99.00.
+_AMOUNT_PATTERN = re.compile(r"(?:[$€£¥]\s?)?\b\d{1,3}(?:[,\s]\d{3})*\.\d{2}\b")
+# Markdown table separator rows, like |---|:---:|, carry no text.
+_TABLE_RULE_PATTERN = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$")
+# DocStrange image placeholders.
+_IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_SPACE_RUN_PATTERN = re.compile(r"[ \t]{2,}")
+
+# Room reserved per segment for the separators and "[...]" markers around it.
+_SEPARATOR_CHARS = len("\n\n[...]\n\n")
+_KEYWORD_WEIGHTS = {keyword: weight for keywords in KEYWORDS.values() for keyword, weight in keywords.items()}
+
+
+def compact_markdown(text: str) -> str:
+    """Drops table rules, image placeholders and padding whitespace from extracted markdown."""
+    lines = []
+    for line in _IMAGE_PATTERN.sub("", text).splitlines():
+        if _TABLE_RULE_PATTERN.match(line):
+            continue
+        lines.append(_SPACE_RUN_PATTERN.sub(" ", line).rstrip())
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _segments(text: str, max_segment_chars: int) -> list[str]:
+    """Splits text into paragraphs, breaking paragraphs longer than the limit on line boundaries."""
+    segments = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        current = ""
+        for line in paragraph.splitlines():
+            while len(line) > max_segment_chars:
+                if current:
+                    segments.append(current)
+                    current = ""
+                segments.append(line[:max_segment_chars])
+                line = line[max_segment_chars:]
+            if current and len(current) + len(line) + 1 > max_segment_chars:
+                segments.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current.strip():
+            segments.append(current)
+    return segments
+
+
+def _score(segment: str) -> float:
+    """Scores a segment by the invoice fields it is likely to contain."""
+    lowered = segment.lower()
+    score = 3.0 * min(len(_TOTAL_PATTERN.findall(segment)), 2)
+    score += 0.5 * min(len(_AMOUNT_PATTERN.findall(segment)), 4)
+    score += 2.0 * bool(_ID_PATTERN.search(segment))
+    score += 1.5 * any(pattern.search(segment) for pattern, _ in _DATE_PATTERNS)
+    score += sum(weight for keyword, weight in _KEYWORD_WEIGHTS.items() if keyword in lowered)
+    # Long runs of prose (terms and conditions, legal footers) are rarely useful.
+    return score / max(1.0, len(segment) / 400)
+
+
+def build_context(document_text: str, max_chars: int, max_segment_chars: int = 600) -> str:
+    """
+    Returns a compact version of the document text that fits in `max_chars`.
+
+    Documents that fit after compaction are returned whole. Longer ones are cut
+    into segments that are scored for totals, amounts, dates, IDs and document
+    keywords; the header (where the vendor usually is) and the closing segments
+    (where the totals usually are) get a bonus. The best segments that fit the
+    budget are joined in their original order, with gaps marked by "[...]".
+    """
+    text = compact_markdown(document_text)
+    if len(text) <= max_chars:
+        return text
+
+    segments = _segments(text, max_segment_chars)
+    scores = [_score(segment) for segment in segments]
+    last = len(segments) - 1
+    for index in range(len(segments)):
+        if index < 2:
+            scores[index] += 4.0 - index
+        elif index > last - 3:
+            scores[index] += 1.0 + index - (last - 2)
+
+    chosen, used = set(), 0
+    for index in sorted(range(len(segments)), key=lambda i: (-scores[i], i)):
+        cost = len(segments[index]) + _SEPARATOR_CHARS
+        if used + cost > max_chars:
+            continue
+        chosen.add(index)
+        used += cost
+
+    parts, previous = [], -1
+    for index in sorted(chosen):
+        if index != previous + 1:
+            parts.append("[...]")
+        parts.append(segments[index])
+        previous = index
+    if previous != last:
+        parts.append("[...]")
+    return "\n\n".join(parts)
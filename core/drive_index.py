@@ -0,0 +1,227 @@
+# agent_name/core/drive_index.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable
+
+# How long a name reserved for an upload is held if the upload never reports back.
+_RESERVATION_SECONDS = 3600
+
+
+def md5_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the hex MD5 digest of a file, the checksum Drive reports for uploaded files."""
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DriveIndex:
+    """
+    A local SQLite mirror of the files in the agent's Drive folders.
+
+    Each row holds a file's name, size and checksums: Drive's MD5 for listed
+    files, plus the SHA-256 the agent computed when it uploaded the file
+    itself. Before an upload, `claim` checks the target folder for an
+    identical file and picks a free name, reserving it so concurrent uploads
+    can't pick the same one. No Drive call is needed for either check.
+    Reservations record the job that made them, so a job interrupted
+    mid-upload (a crash, or a shutdown deadline) gets its reservation back
+    when it is retried instead of waiting for it to expire.
+
+    `sync_folder` keeps the mirror current. Incremental syncs only list files
+    modified since the last one; a periodic full listing also drops files
+    that were deleted or moved out of the folder.
+    """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY,
+                folder_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER,
+                md5 TEXT,
+                content_hash TEXT,
+                pending INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        if "owner" not in {row[1] for row in self._db.execute("PRAGMA table_info(files)")}:
+            self._db.execute("ALTER TABLE files ADD COLUMN owner TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_name ON files (folder_id, name)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_size ON files (folder_id, size)")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS folders (
+                folder_id TEXT PRIMARY KEY,
+                modified_after TEXT,
+                full_synced_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._db.commit()
+
+    def claim(self, folder_id: str, name: str, size: int, content_hash: str, file_path: str,
+              owner: str | None = None) -> tuple[str, str]:
+        """
+        Prepares an upload of a file to a folder on behalf of `owner` (a job
+        key). Returns one of:
+
+        - ("duplicate", name) if an identical file is already there;
+        - ("pending", name) if another owner is uploading an identical file;
+        - ("resume", name) if this owner reserved a name for the file on an
+          earlier attempt, whose upload may or may not have reached Drive;
+        - ("upload", free_name) with the name newly reserved.
+
+        After "upload" or "resume" the caller calls `complete` or `abandon`.
+        """
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM files WHERE pending = 1 AND updated_at < ?", (time.time() - _RESERVATION_SECONDS,)
+            )
+            rows = self._db.execute(
+                "SELECT name, md5, content_hash, pending, owner FROM files WHERE folder_id = ? AND size = ? "
+                "ORDER BY pending",
+                (folder_id, size),
+            ).fetchall()
+        # Files the agent didn't upload only have Drive's MD5, so hash the local file if one could match.
+        local_md5 = md5_file(file_path) if any(row[2] is None and row[1] for row in rows) else None
+        with self._lock:
+            for existing_name, md5, existing_hash, pending, existing_owner in rows:
+                if not ((content_hash and existing_hash == content_hash) or (local_md5 and md5 == local_md5)):
+                    continue
+                if not pending:
+                    if owner:
+                        # The file got there, e.g. from this owner's interrupted attempt; drop its reservation.
+                        self._db.execute(
+                            "DELETE FROM files WHERE folder_id = ? AND pending = 1 AND owner = ?", (folder_id, owner)
+                        )
+                        self._db.commit()
+                    return "duplicate", existing_name
+                if owner and existing_owner == owner:
+                    self._db.execute(
+                        "UPDATE files SET updated_at = ? WHERE folder_id = ? AND name = ? AND pending = 1",
+                        (time.time(), folder_id, existing_name),
+                    )
+                    self._db.commit()
+                    return "resume", existing_name
+                return "pending", existing_name
+
+            stem, extension = os.path.splitext(name)
+            candidate, counter = name, 2
+            while self._db.execute(
+                "SELECT 1 FROM files WHERE folder_id = ? AND name = ?", (folder_id, candidate)
+            ).fetchone():
+                candidate = f"{stem}_{counter}{extension}"
+                counter += 1
+            self._db.execute(
+                """
+                INSERT INTO files (file_id, folder_id, name, size, content_hash, pending, owner, updated_at)
+                VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+                """,
+                (f"pending:{uuid.uuid4().hex}", folder_id, candidate, size, content_hash, owner, time.time()),
+            )
+            self._db.commit()
+        return "upload", candidate
+
+    def complete(self, folder_id: str, name: str, file_id: str | None):
+        """Turns a reservation into the uploaded file's entry."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file_id FROM files WHERE folder_id = ? AND name = ? AND pending = 1", (folder_id, name)
+            ).fetchone()
+            if row:
+                if file_id:
+                    # A sync may have listed the new file already; keep the entry that has our hash.
+                    self._db.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+                self._db.execute(
+                    "UPDATE files SET file_id = ?, pending = 0, updated_at = ? WHERE file_id = ?",
+                    (file_id or f"uploaded:{uuid.uuid4().hex}", time.time(), row[0]),
+                )
+                self._db.commit()
+
+    def abandon(self, folder_id: str, name: str):
+        """Releases a reservation whose upload failed."""
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE folder_id = ? AND name = ? AND pending = 1", (folder_id, name))
+            self._db.commit()
+
+    def needs_full_sync(self, folder_id: str, max_age_seconds: float) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT full_synced_at FROM folders WHERE folder_id = ?", (folder_id,)).fetchone()
+        return row is None or time.time() - row[0] > max_age_seconds
+
+    def sync_folder(self, folder_id: str, list_page: Callable[[str | None, str | None], tuple[list[dict], str | None]],
+                    full: bool = False) -> int:
+        """
+        Brings a folder's entries up to date. `list_page(modified_after, page_token)`
+        returns one page of Drive file resources (id, name, size, md5Checksum,
+        modifiedTime) and the next page token. Returns the number of files listed.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT modified_after FROM folders WHERE folder_id = ?", (folder_id,)).fetchone()
+        modified_after = None if full or row is None else row[0]
+        started = time.time()
+
+        seen, latest, page_token = set(), modified_after, None
+        while True:
+            files, page_token = list_page(modified_after, page_token)
+            with self._lock:
+                for file in files:
+                    if not file.get("id"):
+                        continue
+                    seen.add(file["id"])
+                    latest = max(latest or "", file.get("modifiedTime") or "") or None
+                    size = int(file["size"]) if file.get("size") is not None else None
+                    # Upserts keep the SHA-256 recorded when the agent uploaded the file itself.
+                    self._db.execute(
+                        """
+                        INSERT INTO files (file_id, folder_id, name, size, md5, pending, updated_at)
+                        VALUES (?, ?, ?, ?, ?, 0, ?)
+                        ON CONFLICT (file_id) DO UPDATE SET
+                            folder_id = excluded.folder_id, name = excluded.name, size = excluded.size,
+                            md5 = excluded.md5, updated_at = excluded.updated_at
+                        """,
+                        (file["id"], folder_id, file.get("name") or "", size, file.get("md5Checksum"), time.time()),
+                    )
+                self._db.commit()
+            if not page_token:
+                break
+
+        with self._lock:
+            if full:
+                # Anything not listed is gone from the folder; reservations and uploads since the listing began stay.
+                stale = [
+                    (file_id,) for file_id, in self._db.execute(
+                        "SELECT file_id FROM files WHERE folder_id = ? AND pending = 0 AND updated_at < ?",
+                        (folder_id, started),
+                    ) if file_id not in seen
+                ]
+                self._db.executemany("DELETE FROM files WHERE file_id = ?", stale)
+            self._db.execute(
+                """
+                INSERT INTO folders (folder_id, modified_after, full_synced_at) VALUES (?, ?, ?)
+                ON CONFLICT (folder_id) DO UPDATE SET
+                    modified_after = excluded.modified_after,
+                    full_synced_at = CASE WHEN ? THEN excluded.full_synced_at ELSE folders.full_synced_at END
+                """,
+                (folder_id, latest, started if full else 0, full),
+            )
+            self._db.commit()
+        return len(seen)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,106 @@
+# agent_name/core/filters.py
+
+import os
+import re
+
+# File types DocStrange can extract, by extension.
+DOCUMENT_EXTENSIONS = (
+    ".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp",
+    ".docx", ".doc", ".xlsx", ".xls", ".pptx", ".ppt", ".txt", ".csv", ".html", ".htm",
+)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".gif")
+
+# Mime types that are never documents, even with a misleading filename.
+_JUNK_MIME_PREFIXES = (
+    "text/calendar", "text/x-vcard", "text/vcard", "application/ics",
+    "application/pkcs7-signature", "application/x-pkcs7-signature", "application/pgp-signature",
+    "audio/", "video/", "image/gif",
+)
+# Inline images mail clients attach for signatures and logos, e.g. image001.png or Outlook-abc123.png.
+_INLINE_IMAGE_PATTERN = re.compile(r"^(?:image\d{3}|outlook-[\w-]+|logo[\w-]*|signature[\w-]*)\.\w+$", re.IGNORECASE)
+
+# Leading bytes of each binary format DocStrange accepts, with the extensions they belong to.
+_MAGIC_NUMBERS = (
+    (b"%PDF-", (".pdf",)),
+    (b"\x89PNG\r\n\x1a\n", (".png",)),
+    (b"\xff\xd8\xff", (".jpg", ".jpeg")),
+    (b"II*\x00", (".tif", ".tiff")),
+    (b"MM\x00*", (".tif", ".tiff")),
+    (b"BM", (".bmp",)),
+    (b"PK\x03\x04", (".docx", ".xlsx", ".pptx")),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", (".doc", ".xls", ".ppt")),
+)
+_MAGIC_EXTENSIONS = {ext for _, extensions in _MAGIC_NUMBERS for ext in extensions}
+_TEXT_EXTENSIONS = (".txt", ".csv", ".html", ".htm")
+
+
+def _attachment_size(attachment: dict) -> int | None:
+    """Reads the size from a trigger payload attachment, which may nest it under 'body'."""
+    size = attachment.get("size")
+    if size is None and isinstance(attachment.get("body"), dict):
+        size = attachment["body"].get("size")
+    try:
+        return int(size) if size is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AttachmentFilter:
+    """
+    Decides which attachments are worth processing.
+
+    `reject_reason` looks only at the metadata in the trigger payload, so junk
+    like calendar invites, signature files and inline logos is skipped before
+    it is downloaded. `sniff_bytes` checks the first bytes of a downloaded file so
+    unsupported or truncated files never reach DocStrange. Both return a short
+    reason when the attachment should be skipped, or None to keep it.
+    """
+    def __init__(self, extensions: tuple[str, ...] = DOCUMENT_EXTENSIONS, min_image_bytes: int = 0,
+                 max_bytes: int = 0):
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.min_image_bytes = min_image_bytes
+        self.max_bytes = max_bytes
+
+    def reject_reason(self, attachment: dict) -> str | None:
+        filename = os.path.basename(attachment.get("filename") or "")
+        extension = os.path.splitext(filename)[1].lower()
+        mime_type = (attachment.get("mimeType") or attachment.get("mime_type") or "").lower()
+        size = _attachment_size(attachment)
+
+        if mime_type.startswith(_JUNK_MIME_PREFIXES):
+            return "mime_type"
+        if extension not in self.extensions:
+            return "extension"
+        if extension in IMAGE_EXTENSIONS:
+            if _INLINE_IMAGE_PATTERN.match(filename):
+                return "inline_image"
+            if size is not None and size < self.min_image_bytes:
+                return "too_small"
+        if size is not None and self.max_bytes and size > self.max_bytes:
+            return "too_large"
+        if size == 0:
+            return "empty"
+        return None
+
+    def sniff_bytes(self, head: bytes, tail: bytes, size: int, filename: str) -> str | None:
+        """
+        Checks a downloaded file's leading (and, for PDFs, trailing) bytes,
+        captured while it was read.
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if not head:
+            return "empty"
+        if self.max_bytes and size > self.max_bytes:
+            return "too_large"
+
+        for magic, extensions in _MAGIC_NUMBERS:
+            if head.startswith(magic):
+                if magic == b"%PDF-" and b"%%EOF" not in tail:
+                    return "truncated"
+                return None if extension in extensions or extension not in _MAGIC_EXTENSIONS else "type_mismatch"
+        if head[8:12] == b"WEBP" and head.startswith(b"RIFF"):
+            return None
+        # Anything else has to be plain text (txt, csv, html) to be worth extracting.
+        if extension in _TEXT_EXTENSIONS and b"\x00" not in head:
+            return None
+        return "unsupported"
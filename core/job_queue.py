@@ -0,0 +1,288 @@
+# agent_name/core/job_queue.py
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import fields
+
+from .pipeline import AttachmentJob
+from .tenants import DEFAULT_TENANT_ID
+
+# Job fields persisted between stages so a restarted agent can resume a job
+# from the last stage it completed.
+_PERSISTED_FIELDS = [f.name for f in fields(AttachmentJob) if f.name != "structured_data"]
+
+
+class RetryLater(Exception):
+    """
+    Raised by a stage that can't run yet, e.g. while another job uploads the
+    same file. The job is retried after `delay` seconds without using up
+    one of its attempts.
+    """
+    def __init__(self, message: str, delay: float | None = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+def process_owner(pid: int) -> str | None:
+    """
+    Identifies a running process by its PID and, where /proc is available, its
+    start time, so a recycled PID isn't mistaken for the process that owned a
+    job. Returns None if no process with the PID is running.
+    """
+    if os.name != "posix":
+        # os.kill(pid, 0) sends CTRL_C_EVENT on Windows, so other processes are assumed to have stopped.
+        return None if pid != os.getpid() else f"{pid}:"
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass  # Running, as another user.
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The start time is field 22; fields are counted after the parenthesised command name.
+            started = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = ""
+    return f"{pid}:{started}"
+
+
+def _owner_alive(owner: str | None) -> bool:
+    pid, _, _ = (owner or "").partition(":")
+    return pid.isdigit() and process_owner(int(pid)) == owner
+
+
+class JobQueue:
+    """
+    A durable, SQLite-backed queue of attachment jobs.
+
+    Each job is keyed by (tenant, message_id, attachment_id), so a redelivered
+    trigger event for a job that is already queued or finished is a no-op. The queue
+    records the next stage each job has to run; failed stages are retried with
+    exponential backoff until max_attempts is reached.
+
+    Job status is one of 'running' (owned by the pipeline of the process
+    recorded as its owner), 'pending' (waiting for its next attempt), 'done'
+    or 'failed'. Several processes can share a queue, e.g. `backfill` next to
+    a running agent: each only claims pending jobs, and `recover` only takes
+    back jobs whose owner is no longer running.
+    """
+    def __init__(self, path: str, max_attempts: int = 5, retry_base_seconds: float = 30.0,
+                 retry_max_seconds: float = 3600.0):
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.owner = process_owner(os.getpid())
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_key TEXT PRIMARY KEY,
+                tenant_id TEXT NOT NULL DEFAULT 'default',
+                owner TEXT,
+                message_id TEXT NOT NULL,
+                attachment_id TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                job_state TEXT,
+                structured_data TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "tenant_id" not in columns:
+            # Queues created before multi-tenant support hold only default-tenant jobs.
+            self._db.execute(f"ALTER TABLE jobs ADD COLUMN tenant_id TEXT NOT NULL DEFAULT '{DEFAULT_TENANT_ID}'")
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at)")
+        self._db.commit()
+
+    @staticmethod
+    def job_key(message_id: str, attachment_id: str, tenant_id: str = DEFAULT_TENANT_ID) -> str:
+        # Default-tenant keys keep their original form so existing queues stay valid.
+        if tenant_id == DEFAULT_TENANT_ID:
+            return f"{message_id}:{attachment_id}"
+        return f"{tenant_id}/{message_id}:{attachment_id}"
+
+    def enqueue(self, job: AttachmentJob) -> bool:
+        """
+        Persists a new job, claimed by the caller. Returns False if a job with the
+        same key already exists, in which case the caller should drop it.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                """
+                INSERT OR IGNORE INTO jobs
+                    (job_key, tenant_id, owner, message_id, attachment_id, filename, stage, status, created_at,
+                     updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'running', ?, ?)
+                """,
+                (self.job_key(job.message_id, job.attachment_id, job.tenant_id), job.tenant_id, self.owner,
+                 job.message_id, job.attachment_id, job.filename, job.stage, now, now),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def save(self, job: AttachmentJob):
+        """
+        Records a completed stage, marking the job done once no stages remain.
+        Retry counts are per stage, so completing one resets the attempts.
+        """
+        status = "done" if job.stage == "done" else "running"
+        # The extracted text is only needed while the job is in flight.
+        state = {name: getattr(job, name) for name in _PERSISTED_FIELDS}
+        if status == "done":
+            state["document_text"] = None
+        with self._lock:
+            self._db.execute(
+                """
+                UPDATE jobs SET stage = ?, status = ?, attempts = 0, job_state = ?, structured_data = ?,
+                    updated_at = ?
+                WHERE job_key = ?
+                """,
+                (job.stage, status, json.dumps(state),
+                 json.dumps(job.structured_data) if job.structured_data is not None else None,
+                 time.time(), self.job_key(job.message_id, job.attachment_id, job.tenant_id)),
+            )
+            self._db.commit()
+
+    def checkpoint(self, job: AttachmentJob):
+        """
+        Persists a job's fields in the middle of a stage, e.g. after it moved
+        its file, without counting the stage as complete.
+        """
+        state = {name: getattr(job, name) for name in _PERSISTED_FIELDS}
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET job_state = ?, updated_at = ? WHERE job_key = ?",
+                (json.dumps(state), time.time(), self.job_key(job.message_id, job.attachment_id, job.tenant_id)),
+            )
+            self._db.commit()
+
+    def fail(self, job: AttachmentJob, error: str) -> float | None:
+        """
+        Records a failed attempt at the job's current stage. Returns the delay in
+        seconds before the next attempt, or None if the job has run out of attempts.
+        """
+        key = self.job_key(job.message_id, job.attachment_id, job.tenant_id)
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM jobs WHERE job_key = ?", (key,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if attempts >= self.max_attempts:
+                delay, status, next_attempt_at = None, "failed", 0
+            else:
+                delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+                delay *= random.uniform(0.8, 1.2)
+                status, next_attempt_at = "pending", time.time() + delay
+            self._db.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE job_key = ?
+                """,
+                (status, attempts, next_attempt_at, error, time.time(), key),
+            )
+            self._db.commit()
+        return delay
+
+    def defer(self, job: AttachmentJob, delay: float, reason: str):
+        """Puts a job back in the pending queue for `delay` seconds, keeping its attempt count."""
+        with self._lock:
+            self._db.execute(
+                """
+                UPDATE jobs SET status = 'pending', next_attempt_at = ?, last_error = ?, updated_at = ?
+                WHERE job_key = ?
+                """,
+                (time.time() + delay, reason, time.time(),
+                 self.job_key(job.message_id, job.attachment_id, job.tenant_id)),
+            )
+            self._db.commit()
+
+    def claim_due(self, limit: int = 100, tenant_id: str | None = None) -> list[AttachmentJob]:
+        """Claims pending jobs whose retry time has passed, optionally for one tenant, and returns them."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT job_key, tenant_id, message_id, attachment_id, filename, stage, job_state, structured_data
+                FROM jobs WHERE status = 'pending' AND next_attempt_at <= ? AND (? IS NULL OR tenant_id = ?)
+                ORDER BY next_attempt_at LIMIT ?
+                """,
+                (time.time(), tenant_id, tenant_id, limit),
+            ).fetchall()
+            # Another process sharing the queue may have claimed some of them since the SELECT.
+            rows = [
+                row for row in rows if self._db.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, updated_at = ? "
+                    "WHERE job_key = ? AND status = 'pending'",
+                    (self.owner, time.time(), row[0]),
+                ).rowcount == 1
+            ]
+            self._db.commit()
+
+        jobs = []
+        for _, row_tenant_id, message_id, attachment_id, filename, stage, job_state, structured_data in rows:
+            job = AttachmentJob(message_id=message_id, attachment_id=attachment_id, filename=filename,
+                                tenant_id=row_tenant_id)
+            for name, value in json.loads(job_state or "{}").items():
+                if name in _PERSISTED_FIELDS:
+                    setattr(job, name, value)
+            job.stage = stage
+            job.structured_data = json.loads(structured_data) if structured_data else None
+            jobs.append(job)
+        return jobs
+
+    def counts(self) -> dict[str, int]:
+        """Returns the number of jobs in each status."""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def active_file_paths(self) -> set[str]:
+        """Returns the local file paths held by pending and running jobs, of every owner."""
+        with self._lock:
+            rows = self._db.execute("SELECT job_state FROM jobs WHERE status IN ('pending', 'running')").fetchall()
+        paths = set()
+        for (job_state,) in rows:
+            state = json.loads(job_state or "{}")
+            paths.update(path for path in (state.get("local_file_path"), state.get("final_file_path")) if path)
+        return paths
+
+    def recover(self) -> int:
+        """
+        Returns jobs left 'running' by a process that is no longer running to the
+        pending queue. Jobs owned by another live process, like an agent running
+        next to a backfill, are left alone.
+        """
+        with self._lock:
+            owners = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE status = 'running' AND owner IS NOT ?", (self.owner,)
+            )]
+            recovered = 0
+            for owner in owners:
+                if _owner_alive(owner):
+                    continue
+                recovered += self._db.execute(
+                    "UPDATE jobs SET status = 'pending', next_attempt_at = 0 WHERE status = 'running' AND owner IS ?",
+                    (owner,),
+                ).rowcount
+            self._db.commit()
+        return recovered
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,162 @@
+# agent_name/core/metrics.py
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from rich.console import Console
+
+console = Console()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1 << 10, 1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22, 1 << 24, 1 << 26)
+CONTEXT_CHARS_BUCKETS = (500, 1000, 2000, 4000, 6000, 8000, 16000, 32000, 64000, 128000)
+
+# Type and help text for every metric the agent exports.
+METRIC_DESCRIPTIONS = {
+    "docsorter_stage_seconds": ("histogram", "Time spent in each attachment pipeline stage."),
+    "docsorter_stage_total": ("counter", "Pipeline stage runs by outcome."),
+    "docsorter_tool_call_seconds": ("histogram", "Latency of Composio tool calls, including retries."),
+    "docsorter_tool_calls_total": ("counter", "Composio tool call attempts by outcome."),
+    "docsorter_attachment_bytes": ("histogram", "Size of downloaded attachments."),
+    "docsorter_spooled_total": ("counter", "Downloaded attachments by spool location (memory or disk)."),
+    "docsorter_document_chars": ("histogram", "Length of the extracted text of documents sent to Gemini."),
+    "docsorter_gemini_context_chars": ("histogram", "Length of the document context actually sent to Gemini."),
+    "docsorter_cache_requests_total": ("counter", "Result cache lookups by result."),
+    "docsorter_classifications_total": ("counter", "Classified documents by source."),
+    "docsorter_templates_learned_total": ("counter", "Gemini results recorded as vendor templates, by outcome."),
+    "docsorter_attachments_total": ("counter", "Attachments that finished processing, by outcome."),
+    "docsorter_attachments_filtered_total": ("counter", "Attachments skipped as non-documents, by reason."),
+    "docsorter_drive_uploads_total": ("counter", "Drive uploads by result (uploaded, duplicate, renamed)."),
+    "docsorter_queue_depth": ("gauge", "Attachments waiting in front of each pipeline stage."),
+    "docsorter_jobs": ("gauge", "Jobs in the durable queue by status."),
+    "docsorter_tenant_jobs": ("gauge", "Attachments per tenant waiting in the fair scheduler or in flight."),
+}
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """
+    A small, thread-safe registry of counters, gauges and histograms that
+    renders in the Prometheus text exposition format.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, list] = {}
+        self._gauges: dict[str, Callable[[], dict[tuple, float]]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[1][index] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def register_gauge(self, name: str, callback: Callable[[], dict[tuple, float]]):
+        """Registers a gauge whose values, keyed by label tuples, are read at scrape time."""
+        with self._lock:
+            self._gauges[name] = callback
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes the duration of the enclosed block in the named histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h[0], list(h[1]), h[2], h[3]) for key, h in self._histograms.items()}
+            gauges = dict(self._gauges)
+
+        series: dict[str, list[str]] = {}
+        for (name, labels), value in counters.items():
+            series.setdefault(name, []).append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in histograms.items():
+            lines = series.setdefault(name, [])
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name, callback in gauges.items():
+            try:
+                values = callback()
+            except Exception:
+                continue
+            series.setdefault(name, []).extend(
+                f"{name}{_format_labels(labels)} {value}" for labels, value in values.items()
+            )
+
+        output = []
+        for name in sorted(series):
+            metric_type, description = METRIC_DESCRIPTIONS.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(series[name])
+        return "\n".join(output) + "\n"
+
+
+# The process-wide registry used by the pipeline, tool executor and agent.
+METRICS = Metrics()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", metrics: Metrics = METRICS) -> ThreadingHTTPServer:
+    """Serves the registry at http://host:port/metrics from a background thread."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    console.print(f"[green]✓ Metrics available at http://{host}:{port}/metrics[/green]")
+    return server
+
+
+class TraceLog:
+    """Appends one JSON line per finished attachment, with the timing of each stage."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
@@ -0,0 +1,145 @@
+# agent_name/core/ocr.py
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf is optional; without it PDFs are extracted whole
+    PdfReader = PdfWriter = None
+
+# The extractor owned by the current worker process, created once when the worker starts.
+_worker_extractor = None
+
+
+def default_extractor_factory():
+    """Creates a DocStrange extractor. Runs inside each worker process."""
+    from docstrange import DocumentExtractor
+    return DocumentExtractor()
+
+
+def _init_worker(extractor_factory: Callable):
+    global _worker_extractor
+    _worker_extractor = extractor_factory()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _extract_in_worker(file_path: str) -> str:
+    return _worker_extractor.extract(file_path).extract_markdown()
+
+
+class OcrEngine:
+    """
+    Runs DocStrange extraction in a pool of worker processes, each holding its
+    own warm DocumentExtractor, so OCR uses every core instead of one.
+
+    PDFs with at least `split_min_pages` pages are split into ranges of
+    `pages_per_chunk` pages that are extracted in parallel and joined back in
+    page order. Splitting needs the optional `pypdf` package.
+
+    A worker that dies (out of memory on a huge scan, a crash in native OCR
+    code) breaks the whole process pool. The extraction that hit it raises
+    BrokenProcessPool so the caller can retry it, and the pool is replaced
+    so later extractions keep working.
+    """
+    def __init__(self, extractor_factory: Callable = default_extractor_factory, workers: int | None = None,
+                 pages_per_chunk: int = 10, split_min_pages: int = 20):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_chunk = max(1, pages_per_chunk)
+        self.split_min_pages = split_min_pages
+        self.extractor_factory = extractor_factory
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Spawned workers don't inherit the agent's threads and locks, which forking would.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.extractor_factory,),
+        )
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swaps a broken pool for a new one, unless another thread already has."""
+        with self._pool_lock:
+            if self._pool is broken:
+                self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self):
+        """Starts the workers and loads their extractors, raising if that fails."""
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def extract(self, file_path: str) -> str:
+        """
+        Returns the markdown for a file, extracting large PDFs page range by page
+        range. Raises BrokenProcessPool if a worker died during the extraction.
+        """
+        pool = self._pool
+        try:
+            chunk_dir = self._split_pdf(file_path)
+            if chunk_dir is None:
+                return pool.submit(_extract_in_worker, file_path).result()
+            try:
+                chunk_paths = sorted(os.path.join(chunk_dir, name) for name in os.listdir(chunk_dir))
+                futures = [pool.submit(_extract_in_worker, path) for path in chunk_paths]
+                return "\n\n".join(future.result() for future in futures)
+            finally:
+                shutil.rmtree(chunk_dir, ignore_errors=True)
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise
+
+    def _split_pdf(self, file_path: str) -> str | None:
+        """Writes page-range chunks of a large PDF to a temp dir, or returns None if it shouldn't be split."""
+        if PdfReader is None:
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                if f.read(5) != b"%PDF-":
+                    return None
+            reader = PdfReader(file_path)
+            page_count = len(reader.pages)
+        except Exception:
+            return None
+        if page_count < self.split_min_pages:
+            return None
+
+        chunk_dir = tempfile.mkdtemp(prefix="ocr-chunks-")
+        try:
+            for index, start in enumerate(range(0, page_count, self.pages_per_chunk)):
+                writer = PdfWriter()
+                for page in reader.pages[start:start + self.pages_per_chunk]:
+                    writer.add_page(page)
+                with open(os.path.join(chunk_dir, f"{index:05d}.pdf"), "wb") as f:
+                    writer.write(f)
+        except Exception:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+            return None
+        return chunk_dir
+
+    def close(self, wait: bool = True):
+        """
+        Stops the workers. Without waiting, queued extractions are cancelled and
+        running ones are killed: interpreter exit waits for the pool's manager
+        thread, which would otherwise wait for them.
+        """
+        with self._pool_lock:
+            pool = self._pool
+        # ProcessPoolExecutor has no public way to stop running work before Python 3.14.
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=wait, cancel_futures=not wait)
+        if not wait:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,169 @@
+# agent_name/core/pipeline.py
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+from rich.console import Console
+
+from .metrics import METRICS
+from .tenants import DEFAULT_TENANT_ID
+
+console = Console()
+
+# Placed on a stage queue to tell one of its workers to exit.
+_STOP = object()
+
+
+@dataclass
+class AttachmentJob:
+    """
+    A single email attachment travelling through the processing pipeline.
+    `stage` is the next stage the job has to run, or "done" once it has
+    been through all of them.
+    """
+    message_id: str
+    attachment_id: str
+    filename: str
+    tenant_id: str = DEFAULT_TENANT_ID
+    sender: str | None = None
+    stage: str = "download"
+    local_file_path: str | None = None
+    content_hash: str | None = None
+    cache_hit: bool = False
+    document_text: str | None = None
+    structured_data: dict | None = None
+    classified_by: str | None = None
+    category: str = "Uncategorized"
+    final_file_path: str | None = None
+    # The file's name in its Drive folder; `uploaded` is False when an identical file was already there.
+    drive_name: str | None = None
+    uploaded: bool = False
+    skip_reason: str | None = None
+    trace: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline stage. The handler receives a job and returns it to pass it on
+    to the next stage, or None to finish it early without running the stages
+    after it. Raising marks the stage as failed.
+    """
+    name: str
+    handler: Callable[[AttachmentJob], AttachmentJob | None]
+    workers: int = 1
+
+
+class AttachmentPipeline:
+    """
+    Runs attachments through a sequence of stages, each with its own pool of
+    worker threads connected by bounded queues. Stages overlap, so throughput
+    is bounded by the slowest stage rather than the sum of all of them, and a
+    full queue blocks the stage feeding it (backpressure) instead of growing
+    without limit.
+
+    Jobs can enter at any stage, which lets a durable queue resume them where
+    they left off. The optional callbacks are called from the worker threads
+    after a stage completes (with `job.stage` already advanced) and after a
+    stage raises.
+    """
+    def __init__(
+        self,
+        stages: list[Stage],
+        queue_size: int = 32,
+        on_stage_complete: Callable[[AttachmentJob], None] | None = None,
+        on_failure: Callable[[AttachmentJob, Exception], None] | None = None,
+    ):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.stages = stages
+        self.stage_index = {stage.name: index for index, stage in enumerate(stages)}
+        self.on_stage_complete = on_stage_complete
+        self.on_failure = on_failure
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.threads: list[list[threading.Thread]] = [[] for _ in stages]
+
+    def start(self):
+        """Starts the worker threads for every stage."""
+        for index, stage in enumerate(self.stages):
+            for n in range(max(1, stage.workers)):
+                thread = threading.Thread(
+                    target=self._run_worker, args=(index,),
+                    name=f"{stage.name}-{n}", daemon=True,
+                )
+                thread.start()
+                self.threads[index].append(thread)
+
+    def queue_depths(self) -> dict[str, int]:
+        """Returns the number of jobs waiting in front of each stage."""
+        return {stage.name: self.queues[index].qsize() for index, stage in enumerate(self.stages)}
+
+    def submit(self, job: AttachmentJob):
+        """Queues a job for its next stage, blocking while that stage is full."""
+        self.queues[self.stage_index.get(job.stage, 0)].put(job)
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Drains in-flight jobs stage by stage, then stops every worker. With a
+        timeout, gives up once it has passed and returns False; workers that
+        are still busy are daemon threads and die with the process.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for index, stage in enumerate(self.stages):
+            for _ in range(max(1, stage.workers)):
+                try:
+                    self.queues[index].put(_STOP, timeout=self._remaining(deadline))
+                except queue.Full:
+                    return False
+            for thread in self.threads[index]:
+                thread.join(self._remaining(deadline))
+                if thread.is_alive():
+                    return False
+            self.threads[index].clear()
+        return True
+
+    @staticmethod
+    def _remaining(deadline: float | None) -> float | None:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _run_worker(self, index: int):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while True:
+            job = inbox.get()
+            if job is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                result = stage.handler(job)
+            except Exception as e:
+                self._record_timing(job, stage, start, ok=False)
+                console.print(f"   - [red]❌ ({job.filename}) Stage '{stage.name}' failed: {e}[/red]")
+                if self.on_failure:
+                    try:
+                        self.on_failure(job, e)
+                    except Exception as callback_error:
+                        console.print(f"   - [red]❌ ({job.filename}) Could not record failure: {callback_error}[/red]")
+                continue
+            self._record_timing(job, stage, start, ok=True)
+            next_queue = outbox
+            if result is None:
+                result, next_queue = job, None
+            result.stage = self.stages[index + 1].name if next_queue is not None else "done"
+            if self.on_stage_complete:
+                try:
+                    self.on_stage_complete(result)
+                except Exception as e:
+                    console.print(f"   - [red]❌ ({job.filename}) Could not record stage '{stage.name}': {e}[/red]")
+            if next_queue is not None:
+                next_queue.put(result)
+
+    @staticmethod
+    def _record_timing(job: AttachmentJob, stage: Stage, start: float, ok: bool):
+        elapsed = time.perf_counter() - start
+        METRICS.observe("docsorter_stage_seconds", elapsed, stage=stage.name)
+        METRICS.inc("docsorter_stage_total", stage=stage.name, outcome="success" if ok else "error")
+        job.trace.append({"stage": stage.name, "seconds": round(elapsed, 4), "ok": ok, "at": time.time()})
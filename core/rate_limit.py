@@ -0,0 +1,172 @@
+# agent_name/core/rate_limit.py
+
+import random
+import threading
+import time
+from typing import Any, Callable
+from rich.console import Console
+
+from .metrics import METRICS
+
+console = Console()
+
+# Substrings of error messages that mean the service is throttling us.
+THROTTLE_MARKERS = ("429", "rate limit", "ratelimit", "quota", "too many requests", "resource_exhausted")
+
+# Tools with side effects: a call that fails after the service acted on it would act twice if repeated,
+# e.g. a timeout after Drive stored the upload. They are only retried when throttled, since a throttled
+# call was rejected before it did anything.
+NON_IDEMPOTENT_TOOLS = frozenset({"GOOGLEDRIVE_UPLOAD_FILE", "GOOGLEDRIVE_CREATE_FOLDER"})
+
+
+def is_throttle_error(message: str) -> bool:
+    message = message.lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def parse_rate_limit(value: str) -> tuple[float, int]:
+    """Parses a limit written as 'rate/burst' (calls per second / bucket size), e.g. '2/5'."""
+    rate, _, burst = value.strip().partition("/")
+    return float(rate), int(burst or max(1, float(rate)))
+
+
+def parse_rate_limits(spec: str) -> dict[str, tuple[float, int]]:
+    """Parses per-tool limits written as 'SLUG=rate/burst,SLUG=rate/burst'."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        slug, _, value = entry.partition("=")
+        limits[slug.strip()] = parse_rate_limit(value)
+    return limits
+
+
+class TokenBucket:
+    """A thread-safe token bucket: `rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    An AIMD concurrency limit. Each success raises the limit by 1/limit (about
+    one extra slot per limit's worth of successful calls); each throttling
+    response halves it.
+    """
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, throttled: bool = False, succeeded: bool = True):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class ToolExecutor:
+    """
+    Central wrapper around `composio.tools.execute`. The client is fetched
+    through `get_client` on each call, so it can be built lazily.
+
+    Every call passes through a token bucket and an adaptive concurrency limit
+    for its tool slug. Throttled calls (429/quota errors, raised or returned
+    as an unsuccessful response) shrink the concurrency limit and are retried
+    with exponential backoff and full jitter, as are unexpected exceptions
+    from tools without side effects; for `non_idempotent` tools those are
+    raised at once. Other unsuccessful responses are returned to the caller
+    unchanged.
+    """
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        rate_limits: dict[str, tuple[float, int]] | None = None,
+        default_rate_limit: tuple[float, int] = (10.0, 20),
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        max_retries: int = 4,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 30.0,
+        non_idempotent: frozenset[str] = NON_IDEMPOTENT_TOOLS,
+    ):
+        self.get_client = get_client
+        self.rate_limits = rate_limits or {}
+        self.default_rate_limit = default_rate_limit
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.non_idempotent = non_idempotent
+        self._buckets: dict[str, TokenBucket] = {}
+        self._concurrency: dict[str, AdaptiveConcurrency] = {}
+        self._lock = threading.Lock()
+
+    def _limiters(self, slug: str) -> tuple[TokenBucket, AdaptiveConcurrency]:
+        with self._lock:
+            if slug not in self._buckets:
+                self._buckets[slug] = TokenBucket(*self.rate_limits.get(slug, self.default_rate_limit))
+                self._concurrency[slug] = AdaptiveConcurrency(self.initial_concurrency, maximum=self.max_concurrency)
+            return self._buckets[slug], self._concurrency[slug]
+
+    def execute(self, slug: str, user_id: str, arguments: dict) -> dict:
+        """Executes a Composio tool, throttled and retried as described above."""
+        with METRICS.timer("docsorter_tool_call_seconds", tool=slug):
+            return self._execute_with_retries(slug, user_id, arguments)
+
+    def _execute_with_retries(self, slug: str, user_id: str, arguments: dict) -> dict:
+        bucket, concurrency = self._limiters(slug)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            concurrency.acquire()
+            throttled = succeeded = False
+            try:
+                response = self.get_client().tools.execute(slug=slug, user_id=user_id, arguments=arguments)
+                throttled = not response.get("successful", True) and is_throttle_error(str(response.get("error", "")))
+                if not throttled:
+                    succeeded = True
+                    return response
+                error = response.get("error")
+            except Exception as e:
+                throttled = is_throttle_error(str(e))
+                if attempt == self.max_retries or (not throttled and slug in self.non_idempotent):
+                    raise
+                error = e
+            finally:
+                concurrency.release(throttled, succeeded)
+                outcome = "success" if succeeded else "throttled" if throttled else "error"
+                METRICS.inc("docsorter_tool_calls_total", tool=slug, outcome=outcome)
+
+            if attempt == self.max_retries:
+                return response
+            delay = random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+            reason = "Rate limited" if throttled else "Call failed"
+            console.print(f"   - [yellow]   ↳ ⏳ {reason} on {slug} ({error}); retrying in {delay:.1f}s.[/yellow]")
+            time.sleep(delay)
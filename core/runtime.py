@@ -0,0 +1,174 @@
+# agent_name/core/runtime.py
+
+import asyncio
+import signal
+import threading
+from typing import TYPE_CHECKING, Callable
+from rich.console import Console
+
+if TYPE_CHECKING:
+    from .agent import DocumentSorterAgent
+
+console = Console()
+
+
+class AgentRuntime:
+    """
+    Runs a listening agent on an asyncio event loop.
+
+    Trigger events arrive on Composio's subscription thread and are handed to
+    the loop without blocking it, then queued into the attachment pipeline by
+    `event_workers` consumers per tenant, so a full pipeline never stalls event
+    delivery and one tenant's backlog never holds up another's events.
+    Downloads, OCR and uploads keep running in the pipeline's worker threads;
+    the loop owns the event queue, the retry timer and shutdown.
+
+    SIGINT or SIGTERM starts a graceful shutdown: events that haven't been
+    queued yet are persisted, then in-flight attachments get what is left of
+    `shutdown_timeout` seconds to finish.
+    Whatever is still unfinished stays in the durable job queue and is resumed
+    on the next start. A second signal skips the wait.
+    """
+    def __init__(self, agent: "DocumentSorterAgent", shutdown_timeout: float = 30.0, event_workers: int = 4,
+                 resume_interval: float = 1.0):
+        self.agent = agent
+        self.shutdown_timeout = shutdown_timeout
+        self.event_workers = max(1, event_workers)
+        self.resume_interval = resume_interval
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._events: dict[str, asyncio.Queue] = {}
+        self._stopping: asyncio.Event | None = None
+        self._forced: asyncio.Event | None = None
+
+    def run(self):
+        """Runs the agent until it receives a shutdown signal."""
+        asyncio.run(self._main())
+
+    def submit_event(self, tenant_id: str, data: dict):
+        """Hands a tenant's trigger event to the event loop. Safe to call from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._events[tenant_id].put_nowait, data)
+        except (AttributeError, KeyError, RuntimeError):
+            # The loop isn't running yet or has already closed; persist the event for the next start.
+            self.agent.handle_email_event(data, submit=False, tenant_id=tenant_id)
+
+    def request_stop(self, reason: str = "shutdown requested"):
+        """Starts a graceful shutdown, or forces one if a shutdown is already under way."""
+        if self._stopping.is_set():
+            console.print("\n[bold red]Second shutdown signal received, not waiting for in-flight work.[/bold red]")
+            self._forced.set()
+            return
+        console.print(f"\n[bold red]Shutdown signal received ({reason}). Stopping agent...[/bold red]")
+        self._stopping.set()
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._events = {tenant_id: asyncio.Queue() for tenant_id in self.agent.tenants}
+        self._stopping = asyncio.Event()
+        self._forced = asyncio.Event()
+        self._install_signal_handlers()
+
+        agent = self.agent
+        await self._in_thread(agent.start_processing)
+        await self._in_thread(agent.subscribe, self.submit_event)
+
+        tasks = [
+            asyncio.create_task(self._consume_events(tenant_id))
+            for tenant_id in self._events for _ in range(self.event_workers)
+        ]
+        tasks.append(asyncio.create_task(self._resume_due_jobs()))
+        await self._stopping.wait()
+        deadline = self._loop.time() + self.shutdown_timeout
+
+        # Persist whatever events already arrived, then stop the loops.
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(events.join() for events in self._events.values())), timeout=self.shutdown_timeout
+            )
+        except asyncio.TimeoutError:
+            console.print("[yellow]Timed out persisting pending events.[/yellow]")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._drain(max(0.0, deadline - self._loop.time()))
+
+        # Events that arrived after the consumers stopped are kept for the next start.
+        for tenant_id, events in self._events.items():
+            while not events.empty():
+                self.agent.handle_email_event(events.get_nowait(), submit=False, tenant_id=tenant_id)
+
+    async def _drain(self, timeout: float):
+        """Waits for in-flight attachments to finish, up to the timeout or a forced stop."""
+        console.print(f"[yellow]Waiting up to {timeout:.1f}s for in-flight attachments...[/yellow]")
+        drain = self._in_thread(self.agent.stop_processing, timeout)
+        forced = asyncio.ensure_future(self._forced.wait())
+        await asyncio.wait({drain, forced}, return_when=asyncio.FIRST_COMPLETED)
+        forced.cancel()
+        drained = drain.done() and drain.result()
+        if drained:
+            console.print("[green]✓ All in-flight attachments finished.[/green]")
+        else:
+            # A forced stop leaves stop_processing running; don't let its executors hold up exit.
+            self.agent.abandon_processing()
+            counts = self.agent.jobs.counts()
+            console.print(f"[yellow]Stopped with {counts.get('running', 0)} attachment(s) unfinished; "
+                          "they will resume on the next start.[/yellow]")
+
+    async def _consume_events(self, tenant_id: str):
+        events = self._events[tenant_id]
+        while True:
+            data = await events.get()
+            try:
+                # Events that arrive while shutting down are only persisted, for the next start.
+                submit = not self._stopping.is_set()
+                await self._in_thread(self.agent.handle_email_event, data, submit, tenant_id)
+            except Exception as e:
+                console.print(f"[red]❌ Could not queue trigger event: {e}[/red]")
+            finally:
+                events.task_done()
+
+    async def _resume_due_jobs(self):
+        while True:
+            try:
+                await self._in_thread(self.agent.resume_due_jobs)
+            except Exception as e:
+                console.print(f"[red]❌ Could not resume queued jobs: {e}[/red]")
+            await asyncio.sleep(self.resume_interval)
+
+    def _in_thread(self, func: Callable, *args) -> asyncio.Future:
+        """
+        Runs a blocking call in a daemon thread. Unlike the loop's default
+        executor, a call stuck past the shutdown deadline can't keep the
+        process from exiting.
+        """
+        future = self._loop.create_future()
+
+        def resolve(result=None, error=None):
+            if future.done():
+                return
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        def target():
+            try:
+                outcome = (func(*args), None)
+            except Exception as e:
+                outcome = (None, e)
+            try:
+                self._loop.call_soon_threadsafe(resolve, *outcome)
+            except RuntimeError:
+                pass  # The loop closed while the call was running; nobody is waiting for it.
+
+        threading.Thread(target=target, name=getattr(func, "__name__", "blocking-call"), daemon=True).start()
+        return future
+
+    def _install_signal_handlers(self):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self.request_stop, sig.name)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops don't support add_signal_handler.
+                signal.signal(sig, lambda signum, frame: self._loop.call_soon_threadsafe(
+                    self.request_stop, signal.Signals(signum).name))
@@ -0,0 +1,123 @@
+# agent_name/core/scheduler.py
+
+import threading
+from collections import deque
+from typing import Callable
+from rich.console import Console
+
+from .pipeline import AttachmentJob
+
+console = Console()
+
+
+class FairScheduler:
+    """
+    Admits attachment jobs into the pipeline fairly across tenants.
+
+    Each tenant has its own bounded backlog. A dispatcher thread visits the
+    tenants round robin, admitting up to `weight` jobs per turn from each one
+    that is below its concurrency cap, so a tenant with a flood of mail only
+    ever gets its share of the pipeline. A job counts against its tenant's
+    cap from admission until `release` is called for it.
+    """
+    def __init__(self, backlog_size: int = 32):
+        self.backlog_size = max(1, backlog_size)
+        self._backlogs: dict[str, deque] = {}
+        self._limits: dict[str, int] = {}
+        self._weights: dict[str, int] = {}
+        self._in_flight: dict[str, int] = {}
+        self._order: list[str] = []
+        self._next = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._dispatcher: threading.Thread | None = None
+
+    def add_tenant(self, tenant_id: str, max_concurrency: int = 0, weight: int = 1):
+        """Registers a tenant. `max_concurrency` of 0 means no cap."""
+        with self._condition:
+            if tenant_id not in self._backlogs:
+                self._backlogs[tenant_id] = deque()
+                self._in_flight[tenant_id] = 0
+                self._order.append(tenant_id)
+            self._limits[tenant_id] = max_concurrency
+            self._weights[tenant_id] = max(1, weight)
+
+    def start(self, dispatch: Callable[[AttachmentJob], None]):
+        """Starts handing admitted jobs to `dispatch`, which may block while the pipeline is full."""
+        self._stopping = False
+        self._dispatcher = threading.Thread(target=self._run, args=(dispatch,), name="scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def room(self, tenant_id: str) -> int:
+        """Returns how many more jobs the tenant's backlog can take without blocking."""
+        with self._condition:
+            return max(0, self.backlog_size - len(self._backlogs[tenant_id]))
+
+    def submit(self, job: AttachmentJob):
+        """Adds a job to its tenant's backlog, blocking while that backlog is full."""
+        with self._condition:
+            backlog = self._backlogs[job.tenant_id]
+            while len(backlog) >= self.backlog_size and not self._stopping:
+                self._condition.wait()
+            backlog.append(job)
+            self._condition.notify_all()
+
+    def release(self, job: AttachmentJob):
+        """Marks one of the tenant's admitted jobs as having left the pipeline."""
+        with self._condition:
+            if self._in_flight.get(job.tenant_id, 0) > 0:
+                self._in_flight[job.tenant_id] -= 1
+                self._condition.notify_all()
+
+    def depths(self) -> dict[str, tuple[int, int]]:
+        """Returns (waiting, in flight) job counts per tenant."""
+        with self._condition:
+            return {tenant_id: (len(self._backlogs[tenant_id]), self._in_flight[tenant_id]) for tenant_id in self._order}
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Waits (up to the timeout) for every backlog to be admitted, then stops
+        the dispatcher. Returns False if jobs were still waiting; they stay in
+        the durable queue for the next start.
+        """
+        with self._condition:
+            drained = self._condition.wait_for(
+                lambda: not any(self._backlogs.values()) or self._dispatcher is None, timeout
+            )
+            self._stopping = True
+            self._condition.notify_all()
+        return drained
+
+    def _eligible(self, tenant_id: str) -> bool:
+        limit = self._limits[tenant_id]
+        return bool(self._backlogs[tenant_id]) and (not limit or self._in_flight[tenant_id] < limit)
+
+    def _take_turn(self) -> list[AttachmentJob]:
+        """Admits the next eligible tenant's share of jobs. Must be called with the lock held."""
+        for offset in range(len(self._order)):
+            tenant_id = self._order[(self._next + offset) % len(self._order)]
+            if not self._eligible(tenant_id):
+                continue
+            self._next = (self._next + offset + 1) % len(self._order)
+            admitted = []
+            while len(admitted) < self._weights[tenant_id] and self._eligible(tenant_id):
+                admitted.append(self._backlogs[tenant_id].popleft())
+                self._in_flight[tenant_id] += 1
+            return admitted
+        return []
+
+    def _run(self, dispatch: Callable[[AttachmentJob], None]):
+        while True:
+            with self._condition:
+                admitted = []
+                while not self._stopping and not (admitted := self._take_turn()):
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                self._condition.notify_all()
+            for job in admitted:
+                try:
+                    dispatch(job)
+                except Exception as e:
+                    console.print(f"   - [red]❌ ({job.filename}) Could not admit job: {e}[/red]")
+                    self.release(job)
@@ -0,0 +1,225 @@
+# agent_name/core/search_index.py
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Most matches of a filter that are sorted in memory rather than read in date order from the index.
+_SORT_LIMIT = 5000
+
+# Columns returned for every search hit.
+RESULT_FIELDS = (
+    "tenant_id", "document_type", "vendor_name", "document_id", "document_date", "total_amount", "category",
+    "drive_name", "filename", "message_id", "content_hash", "classified_by", "indexed_at",
+)
+
+
+def _fts_phrase(text: str) -> str:
+    """Quotes text as an FTS5 phrase, so punctuation like the dash in INV-123 is searched, not parsed."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _as_amount(value) -> float | None:
+    try:
+        return float(re.sub(r"[^\d.\-]", "", str(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_date(value) -> str | None:
+    value = str(value or "")
+    return value if re.fullmatch(r"\d{4}-\d{2}-\d{2}", value) else None
+
+
+class SearchIndex:
+    """
+    A local full-text index of processed documents and their extracted fields.
+
+    Each document's DocStrange markdown goes into an FTS5 table, next to a
+    regular table of its structured fields, so archive questions like "every
+    invoice from Acme over 5,000 last quarter" are answered from the index
+    instead of re-downloading and re-OCRing files from Drive. Documents are
+    keyed by tenant and content hash, so the same file arriving twice is
+    indexed once.
+    """
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                tenant_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                message_id TEXT,
+                filename TEXT,
+                drive_name TEXT,
+                category TEXT,
+                document_type TEXT,
+                vendor_name TEXT,
+                document_id TEXT,
+                document_date TEXT,
+                total_amount REAL,
+                classified_by TEXT,
+                indexed_at REAL NOT NULL,
+                UNIQUE (tenant_id, content_hash)
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS documents_type_date ON documents (document_type, document_date)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_date ON documents (document_date)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_number ON documents (document_id COLLATE NOCASE)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_total ON documents (total_amount)")
+        self._db.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                text, vendor_name, document_id, tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """
+        )
+        self._db.commit()
+
+    def add(self, tenant_id: str, content_hash: str, document_text: str | None, structured_data: dict | None,
+            message_id: str | None = None, filename: str | None = None, drive_name: str | None = None,
+            category: str | None = None, classified_by: str | None = None, keep_existing: bool = False):
+        """
+        Indexes a processed document, replacing any earlier entry for the same
+        file. With `keep_existing`, as for a copy that wasn't uploaded because
+        the file was already in Drive, an earlier entry is left as it is.
+        """
+        data = structured_data or {}
+        fields = {
+            "tenant_id": tenant_id,
+            "content_hash": content_hash,
+            "message_id": message_id,
+            "filename": filename,
+            "drive_name": drive_name,
+            "category": category,
+            "document_type": data.get("document_type"),
+            "vendor_name": None if data.get("vendor_name") in (None, "N/A") else str(data["vendor_name"]),
+            "document_id": None if data.get("document_id") in (None, "N/A") else str(data["document_id"]),
+            "document_date": _as_date(data.get("document_date")),
+            "total_amount": _as_amount(data.get("total_amount")),
+            "classified_by": classified_by,
+            "indexed_at": time.time(),
+        }
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM documents WHERE tenant_id = ? AND content_hash = ?", (tenant_id, content_hash)
+            ).fetchone()
+            if row and keep_existing:
+                return
+            if row:
+                self._db.execute("DELETE FROM documents_fts WHERE rowid = ?", row)
+                self._db.execute(
+                    f"UPDATE documents SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                    (*fields.values(), row[0]),
+                )
+                rowid = row[0]
+            else:
+                rowid = self._db.execute(
+                    f"INSERT INTO documents ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                    tuple(fields.values()),
+                ).lastrowid
+            self._db.execute(
+                "INSERT INTO documents_fts (rowid, text, vendor_name, document_id) VALUES (?, ?, ?, ?)",
+                (rowid, document_text or "", fields["vendor_name"] or "", fields["document_id"] or ""),
+            )
+            self._db.commit()
+
+    def search(self, query: str | None = None, document_type: str | None = None, vendor: str | None = None,
+               document_id: str | None = None, after: str | None = None, before: str | None = None,
+               min_total: float | None = None, max_total: float | None = None, tenant_id: str | None = None,
+               limit: int = 20) -> list[dict]:
+        """
+        Returns documents matching every given filter, best full-text matches
+        first when there is a query and newest first otherwise. `query` uses
+        FTS5 syntax (words, "phrases", prefix*, OR, NOT); `vendor` matches
+        vendor names containing the given words; dates are YYYY-MM-DD and
+        inclusive.
+        """
+        match_terms = []
+        if query:
+            match_terms.append(f"({query})")
+        conditions, parameters = [], []
+        # Without a text query there is nothing to rank, so the newest matches are read in date order.
+        # That is cheap unless the filters skip most documents; a selective vendor or amount filter is
+        # answered from its own index instead, and the few matches sorted.
+        sort_matches = False
+        if vendor and query:
+            match_terms.append(f"vendor_name : {_fts_phrase(vendor)}")
+        elif vendor:
+            vendor_match = f"vendor_name : {_fts_phrase(vendor)}"
+            sort_matches = self._fewer_than(
+                "SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?", (vendor_match,)
+            )
+            # A unary + keeps SQLite from looking up every vendor match when scanning by date is cheaper.
+            conditions.append(f"{'' if sort_matches else '+'}d.id IN "
+                              "(SELECT rowid FROM documents_fts WHERE documents_fts MATCH ?)")
+            parameters.append(vendor_match)
+        if not query and not sort_matches and (min_total is not None or max_total is not None):
+            sort_matches = self._fewer_than(
+                "SELECT 1 FROM documents INDEXED BY documents_total WHERE total_amount BETWEEN ? AND ?",
+                (-1e18 if min_total is None else min_total, 1e18 if max_total is None else max_total),
+            )
+        for clause, value in (
+            ("d.document_type = ?", document_type),
+            ("d.document_id = ? COLLATE NOCASE", document_id),
+            ("d.document_date >= ?", after),
+            ("d.document_date <= ?", before),
+            ("d.total_amount >= ?", min_total),
+            ("d.total_amount <= ?", max_total),
+            ("d.tenant_id = ?", tenant_id),
+        ):
+            if value is not None:
+                conditions.append(clause)
+                parameters.append(value)
+
+        columns = ", ".join(f"d.{name}" for name in RESULT_FIELDS)
+        if match_terms:
+            sql = f"""
+                SELECT {columns}, snippet(documents_fts, 0, '[', ']', '…', 12)
+                FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+                WHERE documents_fts MATCH ? {''.join(f' AND {c}' for c in conditions)}
+                ORDER BY bm25(documents_fts) LIMIT ?
+            """
+        else:
+            sql = f"""
+                SELECT {columns}, NULL FROM documents d
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY {'+' if sort_matches else ''}d.document_date DESC, d.indexed_at DESC LIMIT ?
+            """
+
+        def run(match: str | None) -> list[tuple]:
+            with self._lock:
+                return self._db.execute(sql, ([match] if match else []) + parameters + [limit]).fetchall()
+
+        try:
+            rows = run(" AND ".join(match_terms) if match_terms else None)
+        except sqlite3.OperationalError:
+            if not query:
+                raise
+            # Not valid FTS5 syntax (e.g. 'INV-123'); search its words as plain phrases instead.
+            match_terms[0] = " AND ".join(_fts_phrase(word) for word in query.split())
+            rows = run(" AND ".join(match_terms))
+        return [dict(zip(RESULT_FIELDS + ("snippet",), row)) for row in rows]
+
+    def _fewer_than(self, sql: str, parameters: tuple, limit: int = _SORT_LIMIT) -> bool:
+        """Returns whether a query has fewer than `limit` rows, reading at most that many."""
+        with self._lock:
+            count = self._db.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT ?)", parameters + (limit,)).fetchone()[0]
+        return count < limit
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
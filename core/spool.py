@@ -0,0 +1,170 @@
+# agent_name/core/spool.py
+
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+HEAD_BYTES = 512
+TAIL_BYTES = 4096
+
+
+def default_memory_dir() -> str:
+    """Returns a RAM-backed scratch directory where the platform has one, else the temp dir."""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm/document-sorter"
+    return os.path.join(tempfile.gettempdir(), "document-sorter")
+
+
+@dataclass
+class SpooledFile:
+    """A downloaded attachment in its private scratch directory, with what was learned while reading it."""
+    path: str
+    size: int
+    content_hash: str
+    head: bytes
+    tail: bytes
+    in_memory: bool
+
+
+class AttachmentSpool:
+    """
+    Takes ownership of downloaded attachments, reading each one exactly once.
+
+    Composio writes every download to disk. `ingest` moves it into a private
+    per-attachment directory, computing its SHA-256 and keeping its first and
+    last bytes (for type sniffing) in the same pass, so nothing downstream has
+    to read it again before extraction. Attachments up to `max_memory_bytes`
+    go to `memory_dir`, a tmpfs where available, so extraction and upload read
+    them from RAM; larger ones go to `disk_dir`, which is a plain rename when
+    it shares a filesystem with the download. Because every attachment has
+    its own directory, renaming it for upload can't collide with another.
+
+    Attachments waiting in the pipeline or for a retry all hold their copy,
+    so RAM use is also capped in total: once the files in `memory_dir` add
+    up to `max_memory_total_bytes`, or the tmpfs itself is nearly full (64
+    MiB under Docker's default /dev/shm), new attachments go to disk.
+    Directories no queued job refers to any more, e.g. after a crash, are
+    deleted by `remove_orphans` at startup.
+    """
+    def __init__(self, memory_dir: str, disk_dir: str, max_memory_bytes: int,
+                 max_memory_total_bytes: int = 256 * 1024 * 1024, chunk_size: int = 1 << 20):
+        self.memory_dir = memory_dir
+        self.disk_dir = disk_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_memory_total_bytes = max_memory_total_bytes
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        os.makedirs(memory_dir, exist_ok=True)
+        os.makedirs(disk_dir, exist_ok=True)
+        # Bytes held in memory_dir per attachment directory, including files left by a previous run.
+        self._memory_usage = {
+            os.path.abspath(entry.path): sum(file.stat().st_size for file in os.scandir(entry.path) if file.is_file())
+            for entry in os.scandir(memory_dir) if entry.is_dir() and entry.name.startswith("att-")
+        }
+
+    def _reserve_memory(self, size: int) -> bool:
+        """Returns whether an attachment of `size` bytes fits in RAM. Called with the lock held."""
+        if size > self.max_memory_bytes or sum(self._memory_usage.values()) + size > self.max_memory_total_bytes:
+            return False
+        try:
+            free = shutil.disk_usage(self.memory_dir).free
+        except OSError:
+            return False
+        return size + self.chunk_size <= free
+
+    def ingest(self, source_path: str, name: str) -> SpooledFile:
+        """Moves a downloaded file into the spool under `name`, hashing it on the way."""
+        size = os.path.getsize(source_path)
+        with self._lock:
+            in_memory = self._reserve_memory(size)
+            job_dir = tempfile.mkdtemp(prefix="att-", dir=self.memory_dir if in_memory else self.disk_dir)
+            if in_memory:
+                self._memory_usage[os.path.abspath(job_dir)] = size
+        try:
+            return self._ingest(source_path, name, size, job_dir, in_memory)
+        except OSError as e:
+            if not in_memory or e.errno != errno.ENOSPC:
+                raise
+            # The tmpfs filled up anyway, e.g. shared with another process; the download is still there.
+            job_dir = tempfile.mkdtemp(prefix="att-", dir=self.disk_dir)
+            return self._ingest(source_path, name, size, job_dir, False)
+
+    def _ingest(self, source_path: str, name: str, size: int, job_dir: str, in_memory: bool) -> SpooledFile:
+        root = os.path.dirname(job_dir)
+        target_path = os.path.join(job_dir, os.path.basename(name) or "attachment")
+
+        digest = hashlib.sha256()
+        head, tail = b"", b""
+        same_device = os.stat(source_path).st_dev == os.stat(root).st_dev
+        try:
+            with open(source_path, "rb") as source:
+                target = None if same_device else open(target_path, "wb")
+                try:
+                    # Small files are read in a single call; large ones are streamed.
+                    chunk_size = max(size, 1) if in_memory else self.chunk_size
+                    for chunk in iter(lambda: source.read(chunk_size), b""):
+                        digest.update(chunk)
+                        if len(head) < HEAD_BYTES:
+                            head += chunk[:HEAD_BYTES - len(head)]
+                        tail = chunk[-TAIL_BYTES:] if len(chunk) >= TAIL_BYTES else (tail + chunk)[-TAIL_BYTES:]
+                        if target:
+                            target.write(chunk)
+                finally:
+                    if target:
+                        target.close()
+            if same_device:
+                os.rename(source_path, target_path)
+            else:
+                os.remove(source_path)
+        except BaseException:
+            self._remove(job_dir)
+            raise
+        return SpooledFile(target_path, size, digest.hexdigest(), head, tail, in_memory)
+
+    def release(self, path: str | None):
+        """Deletes a spooled file and its directory. Paths outside the spool are just removed."""
+        if not path:
+            return
+        job_dir = os.path.dirname(os.path.abspath(path))
+        if os.path.dirname(job_dir) in (os.path.abspath(self.memory_dir), os.path.abspath(self.disk_dir)):
+            self._remove(job_dir)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def remove_orphans(self, keep_paths: set[str], min_age_seconds: float = 300.0) -> int:
+        """
+        Deletes attachment directories left behind by an earlier run, i.e. those
+        holding none of `keep_paths`. Directories changed in the last
+        `min_age_seconds` are kept, as another process sharing the spool may
+        not have recorded its download yet. Returns the number removed.
+        """
+        keep_dirs = {os.path.dirname(os.path.abspath(path)) for path in keep_paths}
+        cutoff = time.time() - min_age_seconds
+        removed = 0
+        for root in {os.path.abspath(self.memory_dir), os.path.abspath(self.disk_dir)}:
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                continue
+            for entry in entries:
+                if not (entry.name.startswith("att-") and entry.is_dir(follow_symlinks=False)):
+                    continue
+                job_dir = os.path.join(root, entry.name)
+                try:
+                    if job_dir in keep_dirs or entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                        continue
+                except OSError:
+                    continue
+                self._remove(job_dir)
+                removed += 1
+        return removed
+
+    def _remove(self, job_dir: str):
+        shutil.rmtree(job_dir, ignore_errors=True)
+        with self._lock:
+            self._memory_usage.pop(os.path.abspath(job_dir), None)
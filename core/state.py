@@ -0,0 +1,57 @@
+# agent_name/core/state.py
+
+import json
+import os
+import threading
+import time
+
+
+class StartupState:
+    """
+    A small JSON file caching the IDs the agent resolves at startup: the
+    connected account per auth config, the Gmail trigger and the Drive
+    folders. Entries are scoped by user ID so switching users never reuses
+    another user's IDs.
+    """
+    def __init__(self, path: str, user_id: str):
+        self.path = path
+        self.user_id = user_id
+        self._lock = threading.Lock()
+
+    def _read_all(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self) -> dict:
+        """Returns the cached state for this user, or an empty dict."""
+        with self._lock:
+            return self._read_all().get(self.user_id, {})
+
+    def save(self, connections: dict[str, str], trigger_id: str, folder_ids: dict[str, str]):
+        """Atomically replaces the cached state for this user."""
+        with self._lock:
+            states = self._read_all()
+            states[self.user_id] = {
+                "connections": connections,
+                "trigger_id": trigger_id,
+                "folder_ids": folder_ids,
+                "saved_at": time.time(),
+            }
+            self._write_all(states)
+
+    def clear(self):
+        """Atomically removes the cached state for this user, so the next start runs the full setup."""
+        with self._lock:
+            states = self._read_all()
+            if states.pop(self.user_id, None) is not None:
+                self._write_all(states)
+
+    def _write_all(self, states: dict):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(states, f, indent=2)
+        os.replace(tmp_path, self.path)
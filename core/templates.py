@@ -0,0 +1,298 @@
+# agent_name/core/templates.py
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from email.utils import parseaddr
+
+from .classifier import DOCUMENT_TYPES, _DATE_PATTERNS
+
+_AMOUNT_PATTERN = re.compile(r"(?<![\d.,])([0-9]{1,3}(?:,[0-9]{3})+(?:\.[0-9]{2})?|[0-9]+\.[0-9]{2})(?![\d])")
+_MONTH_PATTERN = re.compile(
+    r"\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t|tember)?"
+    r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b"
+)
+_NON_LETTERS = re.compile(r"[^a-z]+")
+# Fields a template extracts; the type and vendor are the same for every document of a layout.
+TEMPLATE_FIELDS = ("document_id", "document_date", "total_amount")
+_ANCHOR_WORDS = 4
+_FINGERPRINT_LINES = 12
+
+
+def sender_address(sender: str | None) -> str | None:
+    """Returns the lowercased email address from a From header like 'Acme <billing@acme.com>'."""
+    address = parseaddr(sender or "")[1].strip().lower()
+    return address if "@" in address else None
+
+
+def _label(text: str) -> str:
+    """Reduces text to its lowercase words, without numbers, months or punctuation."""
+    return " ".join(_MONTH_PATTERN.sub(" ", _NON_LETTERS.sub(" ", text.lower())).split())
+
+
+def layout_fingerprint(document_text: str) -> str | None:
+    """
+    Hashes the wording of the document's first lines with every number and
+    month name removed, so two documents generated from the same layout share
+    a fingerprint whatever their IDs, dates and amounts.
+    """
+    skeleton = []
+    for line in document_text.splitlines():
+        label = _label(line)
+        if len(label) >= 3:
+            skeleton.append(label)
+            if len(skeleton) == _FINGERPRINT_LINES:
+                break
+    if len(skeleton) < 3:
+        return None
+    return hashlib.sha1("\n".join(skeleton).encode()).hexdigest()[:16]
+
+
+def _anchor(prefix: str) -> str:
+    """The last few words before a value on its line, which label what the value is."""
+    return " ".join(_label(prefix).split()[-_ANCHOR_WORDS:])
+
+
+def _id_shape(document_id: str) -> str:
+    """A pattern matching IDs like this one: same letters and separators, any digits."""
+    return "".join(r"\d+" if part.isdigit() else re.escape(part) for part in re.split(r"(\d+)", document_id) if part)
+
+
+def _candidates(document_text: str, field: str, rule: dict) -> list[tuple[str, object]]:
+    """Finds every (anchor, value) in the text that could be `field` under the rule's value format."""
+    found = []
+    if field == "document_id":
+        pattern = re.compile(rf"(?<![A-Za-z0-9])({rule['shape']})(?![A-Za-z0-9])", re.IGNORECASE)
+    elif field == "document_date":
+        pattern = _DATE_PATTERNS[rule["pattern"]][0]
+    else:
+        pattern = _AMOUNT_PATTERN
+    for line in document_text.splitlines():
+        for match in pattern.finditer(line):
+            raw = match.group(1)
+            if field == "document_date":
+                try:
+                    value = datetime.strptime(raw, rule["format"]).date().isoformat()
+                except ValueError:
+                    continue
+            elif field == "total_amount":
+                value = float(raw.replace(",", ""))
+            else:
+                value = raw
+            found.append((_anchor(line[:match.start(1)]), value))
+    return found
+
+
+def _learn_rule(document_text: str, field: str, value) -> dict | None:
+    """
+    Works out how to find a known field value in the text: the words that label
+    it and the shape or format it is written in. Returns None if the value
+    can't be found after a label.
+    """
+    if field == "document_id":
+        rules = [{"shape": _id_shape(str(value).strip())}]
+    elif field == "document_date":
+        rules = [{"pattern": index, "format": fmt} for index, (_, formats) in enumerate(_DATE_PATTERNS)
+                 for fmt in formats]
+    else:
+        rules = [{}]
+
+    for rule in rules:
+        matches = [anchor for anchor, found in _candidates(document_text, field, rule)
+                   if anchor and _same_value(field, found, value)]
+        if matches:
+            # Totals are repeated (subtotal, total, amount due); the final one is the one that counts.
+            position = -1 if field == "total_amount" else 0
+            return dict(rule, anchor=matches[position], position=position)
+    return None
+
+
+def _same_value(field: str, a, b) -> bool:
+    if field == "total_amount":
+        try:
+            return abs(float(a) - float(b)) < 0.005
+        except (TypeError, ValueError):
+            return False
+    return str(a).strip().lower() == str(b).strip().lower()
+
+
+def _plausible(field: str, value) -> bool:
+    if field == "document_date":
+        return "1990-01-01" <= value <= (date.today() + timedelta(days=366)).isoformat()
+    if field == "total_amount":
+        return value > 0
+    return True
+
+
+def apply_template(template: dict, document_text: str) -> dict | None:
+    """
+    Extracts the template's fields from a document. Returns None unless every
+    field the template knows how to find is found, after its label, in the
+    expected format and with a plausible value.
+    """
+    data = {"document_type": template["document_type"], "vendor_name": template["vendor_name"]}
+    for field in TEMPLATE_FIELDS:
+        rule = template["fields"].get(field)
+        if rule is None:
+            data[field] = "N/A"
+            continue
+        values = [value for anchor, value in _candidates(document_text, field, rule) if anchor == rule["anchor"]]
+        if not values or not _plausible(field, values[rule["position"]]):
+            return None
+        data[field] = values[rule["position"]]
+    return data
+
+
+def build_template(document_text: str, structured_data: dict) -> dict | None:
+    """
+    Turns a validated extraction into a template. Returns None if the result
+    isn't a usable document or any of its field values can't be traced back
+    to a labelled spot in the text.
+    """
+    doc_type, vendor = structured_data.get("document_type"), structured_data.get("vendor_name")
+    if doc_type not in DOCUMENT_TYPES or not vendor or vendor == "N/A":
+        return None
+    rules = {}
+    for field in TEMPLATE_FIELDS:
+        value = structured_data.get(field)
+        if value in (None, "", "N/A"):
+            rules[field] = None
+            continue
+        rules[field] = _learn_rule(document_text, field, value)
+        if rules[field] is None:
+            return None
+    if sum(rule is not None for rule in rules.values()) < 2:
+        return None
+    return {"document_type": doc_type, "vendor_name": vendor, "fields": rules}
+
+
+class TemplateStore:
+    """
+    Learns per-vendor extraction templates from validated Gemini results.
+
+    A template is keyed by the sender's address and the document's layout
+    fingerprint, and records for each field the words that label it and the
+    format of its value. A new template must reproduce Gemini's answer on
+    `min_confirmations` more documents of the same layout before it is
+    used; after that, matching documents are extracted locally, falling
+    back to Gemini whenever a template can't find every field. A template
+    that disagrees with Gemini is relearned from the newer result.
+
+    Lookups try the sender and layout together, then the layout from any
+    sender. A template is never applied to another layout: it carries the
+    document type of the layout it was learned on, and can't tell which
+    fields a different layout has that it doesn't capture.
+    """
+    def __init__(self, path: str, min_confirmations: int = 1, max_templates: int = 10000):
+        self.min_confirmations = min_confirmations
+        self.max_templates = max_templates
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS templates (
+                sender TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                template TEXT NOT NULL,
+                confirmations INTEGER NOT NULL DEFAULT 0,
+                uses INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (sender, fingerprint)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS templates_fingerprint ON templates (fingerprint)")
+        self._db.commit()
+
+    def extract(self, document_text: str, sender: str | None = None) -> dict | None:
+        """Returns the fields extracted by a confirmed template, or None if no template fits."""
+        fingerprint = layout_fingerprint(document_text)
+        address = sender_address(sender) or ""
+        if fingerprint is None:
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT sender, fingerprint, template FROM templates
+                WHERE confirmations >= ? AND fingerprint = ?
+                ORDER BY sender = ? DESC, uses DESC
+                LIMIT 5
+                """,
+                (self.min_confirmations, fingerprint, address),
+            ).fetchall()
+
+        for row_sender, row_fingerprint, template in rows:
+            data = apply_template(json.loads(template), document_text)
+            if data is not None:
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE templates SET uses = uses + 1, used_at = ? WHERE sender = ? AND fingerprint = ?",
+                        (time.time(), row_sender, row_fingerprint),
+                    )
+                    self._db.commit()
+                return data
+        return None
+
+    def learn(self, document_text: str, structured_data: dict, sender: str | None = None) -> str | None:
+        """
+        Records a validated extraction. Returns what happened to the template:
+        'confirmed', 'learned' (new or relearned) or None if the result couldn't
+        be turned into a template.
+        """
+        fingerprint = layout_fingerprint(document_text)
+        template = build_template(document_text, structured_data) if fingerprint else None
+        if template is None:
+            return None
+        key = (sender_address(sender) or "", fingerprint)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT template FROM templates WHERE sender = ? AND fingerprint = ?", key
+            ).fetchone()
+            existing = apply_template(json.loads(row[0]), document_text) if row else None
+            if existing is not None and all(
+                _same_value(field, existing[field], structured_data.get(field, "N/A"))
+                for field in ("document_type",) + TEMPLATE_FIELDS
+            ):
+                self._db.execute(
+                    "UPDATE templates SET confirmations = confirmations + 1, updated_at = ? "
+                    "WHERE sender = ? AND fingerprint = ?",
+                    (now,) + key,
+                )
+                outcome = "confirmed"
+            else:
+                self._db.execute(
+                    """
+                    INSERT OR REPLACE INTO templates
+                        (sender, fingerprint, template, confirmations, uses, updated_at, used_at)
+                    VALUES (?, ?, ?, 0, 0, ?, ?)
+                    """,
+                    key + (json.dumps(template), now, now),
+                )
+                self._evict()
+                outcome = "learned"
+            self._db.commit()
+        return outcome
+
+    def _evict(self):
+        """Drops the least recently used templates beyond max_templates."""
+        self._db.execute(
+            """
+            DELETE FROM templates WHERE rowid IN (
+                SELECT rowid FROM templates ORDER BY used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_templates,),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
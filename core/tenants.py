@@ -0,0 +1,75 @@
+# agent_name/core/tenants.py
+
+import json
+from dataclasses import dataclass, field
+
+DEFAULT_TENANT_ID = "default"
+DRIVE_FOLDERS = ("Invoices", "Receipts", "Purchase Orders", "Uncategorized")
+
+
+@dataclass
+class Tenant:
+    """
+    One mailbox served by the agent: the Composio user it belongs to, the auth
+    configs for its Gmail and Drive connections, and the Drive folder each
+    category is filed into. `max_concurrency` caps how many of its
+    attachments are in the pipeline at once (0 = no cap) and `weight` is its
+    share of pipeline admissions relative to other tenants.
+
+    `trigger_id` and `folder_ids` are filled in when the agent sets it up.
+    """
+    tenant_id: str
+    user_id: str
+    gmail_auth_config_id: str
+    drive_auth_config_id: str
+    folders: dict[str, str] = field(default_factory=lambda: {name: name for name in DRIVE_FOLDERS})
+    max_concurrency: int = 0
+    weight: int = 1
+    trigger_id: str | None = None
+    folder_ids: dict[str, str] = field(default_factory=dict)
+
+
+def load_tenants(path: str, gmail_auth_config_id: str | None = None, drive_auth_config_id: str | None = None,
+                 max_concurrency: int = 0) -> list[Tenant]:
+    """
+    Reads tenants from a JSON file shaped like:
+
+        {"tenants": [{"id": "acme", "user_id": "acme-mailbox",
+                      "gmail_auth_config_id": "ac_...", "google_drive_auth_config_id": "ac_...",
+                      "folders": {"Invoices": "Acme Invoices"}, "max_concurrency": 8, "weight": 2}]}
+
+    Only "id" and "user_id" are required. Auth config IDs default to the ones
+    passed in (the agent's .env settings), folders not listed keep their
+    default names and `max_concurrency` defaults to the value passed in.
+    """
+    with open(path) as f:
+        entries = json.load(f).get("tenants", [])
+    if not entries:
+        raise ValueError(f"No tenants are defined in {path}.")
+
+    tenants, seen_ids, seen_users = [], set(), set()
+    for entry in entries:
+        tenant_id, user_id = entry.get("id"), entry.get("user_id")
+        if not tenant_id or not user_id:
+            raise ValueError(f"Every tenant in {path} needs an 'id' and a 'user_id'.")
+        if tenant_id in seen_ids or user_id in seen_users:
+            raise ValueError(f"Tenant '{tenant_id}' reuses an id or user_id already defined in {path}.")
+        seen_ids.add(tenant_id)
+        seen_users.add(user_id)
+
+        gmail_id = entry.get("gmail_auth_config_id") or gmail_auth_config_id
+        drive_id = entry.get("google_drive_auth_config_id") or drive_auth_config_id
+        if not gmail_id or not drive_id:
+            raise ValueError(f"Tenant '{tenant_id}' has no Gmail or Google Drive auth config ID.")
+        folders = {name: name for name in DRIVE_FOLDERS}
+        folders.update({name: folder for name, folder in entry.get("folders", {}).items() if name in folders})
+        tenants.append(Tenant(
+            tenant_id=tenant_id,
+            user_id=user_id,
+            gmail_auth_config_id=gmail_id,
+            drive_auth_config_id=drive_id,
+            folders=folders,
+            max_concurrency=int(entry.get("max_concurrency", max_concurrency)),
+            weight=max(1, int(entry.get("weight", 1))),
+        ))
+    return tenants
@@ -1,7 +1,13 @@
 # main.py
+import json
+import os
+import time
 import typer
 from rich.console import Console
+from rich.table import Table
 from core.agent import DocumentSorterAgent
+from core.constants import SEARCH_INDEX_ENABLED, SEARCH_INDEX_PATH
+from core.search_index import SearchIndex
 
 app = typer.Typer()
 console = Console()
@@ -62,5 +68,74 @@ def start():
     except Exception as e:
         console.print(f"[bold red]A critical error occurred: {e}[/bold red]")
 
+@app.command()
+def backfill(
+    after: str = typer.Option(None, help="Only process messages received after this date (YYYY-MM-DD)."),
+    before: str = typer.Option(None, help="Only process messages received before this date (YYYY-MM-DD)."),
+    label: list[str] = typer.Option(None, help="Gmail label ID to restrict the backfill to. Can be repeated."),
+    query: str = typer.Option("", help="Extra Gmail search query, e.g. 'from:billing@example.com'."),
+    concurrency: int = typer.Option(4, help="Worker threads for the download, classify and upload stages."),
+    page_size: int = typer.Option(100, help="Messages fetched per Gmail page."),
+    max_messages: int = typer.Option(None, help="Stop after scanning this many messages in this run."),
+    restart: bool = typer.Option(False, help="Ignore the saved checkpoint and start from the newest message."),
+    tenant: str = typer.Option("default", help="Tenant whose mailbox to backfill, when TENANTS_PATH is set."),
+):
+    """
+    Processes existing Gmail messages with attachments. Progress is checkpointed,
+    so an interrupted backfill can be resumed by running the same command again.
+    """
+    try:
+        agent = DocumentSorterAgent()
+        agent.backfill(after, before, label, query, concurrency, page_size, max_messages, restart, tenant)
+    except Exception as e:
+        console.print(f"[bold red]A critical error occurred: {e}[/bold red]")
+
+@app.command()
+def search(
+    query: str = typer.Argument(None, help="Full-text query over document contents, e.g. 'consulting OR retainer'."),
+    document_type: str = typer.Option(None, "--type", help="Only this document type, e.g. Invoice."),
+    vendor: str = typer.Option(None, help="Only vendors whose name contains these words."),
+    document_id: str = typer.Option(None, "--id", help="Only the document with this invoice, receipt or PO number."),
+    after: str = typer.Option(None, help="Only documents dated on or after this date (YYYY-MM-DD)."),
+    before: str = typer.Option(None, help="Only documents dated on or before this date (YYYY-MM-DD)."),
+    min_total: float = typer.Option(None, help="Only documents with at least this total."),
+    max_total: float = typer.Option(None, help="Only documents with at most this total."),
+    tenant: str = typer.Option(None, help="Only documents of this tenant."),
+    limit: int = typer.Option(20, help="Maximum number of results."),
+    json_output: bool = typer.Option(False, "--json", help="Print the results as JSON."),
+):
+    """
+    Searches the text and extracted fields of processed documents, without
+    touching Gmail or Drive.
+    """
+    if not SEARCH_INDEX_ENABLED or not os.path.exists(SEARCH_INDEX_PATH):
+        console.print(f"[bold red]No search index found at {SEARCH_INDEX_PATH}.[/bold red]")
+        raise typer.Exit(1)
+    started = time.perf_counter()
+    results = SearchIndex(SEARCH_INDEX_PATH).search(
+        query, document_type, vendor, document_id, after, before, min_total, max_total, tenant, limit
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if json_output:
+        console.print_json(json.dumps(results))
+        return
+
+    table = Table(title=f"{len(results)} document(s) in {elapsed_ms:.1f} ms")
+    for column in ("Date", "Type", "Vendor", "ID", "Total", "Drive file"):
+        table.add_column(column, justify="right" if column == "Total" else "left")
+    if query:
+        table.add_column("Match")
+    for result in results:
+        total = result["total_amount"]
+        row = [
+            result["document_date"] or "", result["document_type"] or "", result["vendor_name"] or "",
+            result["document_id"] or "", f"{total:,.2f}" if total is not None else "",
+            f"{result['category']}/{result['drive_name']}",
+        ]
+        if query:
+            row.append(" ".join((result["snippet"] or "").split()))
+        table.add_row(*row)
+    console.print(table)
+
 if __name__ == "__main__":
     app()
\ No newline at end of file